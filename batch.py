@@ -0,0 +1,115 @@
+###############################################################################
+##                                                                           ##
+##       Batch converter: runs level_to_contour on a folder of surveys       ##
+##                                                                           ##
+###############################################################################
+
+# Usage: python batch.py <folder or glob> [level_to_contour options]
+# Every survey (DXF or points file, not the outputs of an earlier run) is
+# converted in its own worker process with the same options,
+# then a summary of successes, failures and timings is printed and written
+# to a JSON file.
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+# Workers never open a window, make sure matplotlib does not try to
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import level_to_contour
+import point_io
+
+SURVEY_EXTENSIONS=('.dxf',)+point_io.POINT_EXTENSIONS
+# Names level_to_contour gives its own outputs
+GENERATED_SUFFIXES=('_with_contours','_grid')
+
+def find_inputs(pattern):
+    # A folder means every survey in it, anything else is treated as a glob
+    if(os.path.isdir(pattern)):
+        pattern=os.path.join(pattern,'*')
+    files=sorted(f for f in glob.glob(pattern) if os.path.isfile(f))
+    surveys=[f for f in files if os.path.splitext(f)[1].lower() in SURVEY_EXTENSIONS]
+    return [f for f in surveys if not is_generated(f,surveys)]
+
+def is_generated(filename,surveys):
+    # Outputs of an earlier run, converting them again would only make *_with_contours_with_contours.dxf
+    base,extension=os.path.splitext(filename)
+    if(base.endswith(GENERATED_SUFFIXES)):
+        return True
+    # The csv written by -c next to its DXF
+    return extension.lower()=='.csv' and any(os.path.splitext(f)[0]==base and f.lower().endswith('.dxf') for f in surveys)
+
+def convert(args):
+    # Runs in a worker process: convert one file and capture what it printed
+    log=io.StringIO()
+    start=time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            output=level_to_contour.run(args)
+        status='ok' if output else 'skipped'
+        error=None
+    except Exception:
+        output=None
+        status='failed'
+        error=traceback.format_exc()
+    return {
+        'input': args.input_file,
+        'output': output,
+        'status': status,
+        'seconds': time.perf_counter()-start,
+        'error': error,
+        'log': log.getvalue(),
+    }
+
+if(__name__=="__main__"):
+    parser=level_to_contour.build_parser(prog='batch')
+    parser.description='Runs level_to_contour on every survey (DXF or points file) in a folder, or matching a glob, in parallel.'
+    parser.add_argument('--workers', type=level_to_contour.positive_int, default=None,help='Number of files converted at the same time (default: all cores)')
+    parser.add_argument('--summary', type=str, default='batch_summary.json',help='Where to write the JSON summary of the run')
+    parser.set_defaults(overwrite='never')
+    args=parser.parse_args()
+    if(args.output_file):
+        parser.error('-o/--output_file names a single output, it cannot be used in batch mode')
+    if(args.show_3d):
+        parser.error('-s/--show_3d needs a window, it cannot be used in batch mode')
+    if(args.overwrite=='ask'):
+        parser.error('--overwrite ask would wait for input, use always or never in batch mode')
+
+    inputs=find_inputs(args.input_file)
+    if(len(inputs)==0):
+        print('[-] No surveys found in %s'%args.input_file)
+        exit(1)
+    print('[+] Converting %d files...'%len(inputs))
+
+    jobs=[]
+    for filename in inputs:
+        file_args=argparse.Namespace(**vars(args))
+        file_args.input_file=filename
+        jobs.append(file_args)
+
+    start=time.perf_counter()
+    results=[]
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for result in executor.map(convert,jobs):
+            results.append(result)
+            if(args.verbose):
+                print(result['log'])
+            if(result['status']=='failed'):
+                print('[!] %s failed after %.2fs:\n%s'%(result['input'],result['seconds'],result['error']))
+            else:
+                print('[+] %s %s in %.2fs'%(result['input'],result['status'],result['seconds']))
+    total=time.perf_counter()-start
+
+    counts={status:sum(1 for r in results if r['status']==status) for status in ('ok','skipped','failed')}
+    print('[i] %d converted, %d skipped, %d failed in %.2fs'%(counts['ok'],counts['skipped'],counts['failed'],total))
+    with open(args.summary,'w') as f:
+        json.dump({'seconds':total,'counts':counts,'files':results},f,indent=2)
+    print('[+] Summary written to \033[34m%s\033[0m'%args.summary)
+    exit(1 if counts['failed'] else 0)
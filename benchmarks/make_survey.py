@@ -0,0 +1,88 @@
+###############################################################################
+##                                                                           ##
+##       Synthetic survey generator for benchmarking level_to_contour        ##
+##                                                                           ##
+###############################################################################
+
+# Writes a DXF laid out like a real job: a POINT per shot and an MTEXT with
+# the level reading next to it, over a configurable terrain. Some labels get
+# a note on a second line and some MTEXTs are not numbers at all, like the
+# plot and benchmark notes found on real drawings.
+
+import argparse
+import math
+import ezdxf
+import numpy as np
+
+TERRAINS=('plane','hills','pit')
+
+def terrain_height(x,y,terrain,extent):
+    # Heights in meters above the zero point
+    if(terrain=='plane'):
+        return 0.02*x+0.01*y
+    if(terrain=='pit'):
+        r=np.hypot(x-extent/2,y-extent/2)
+        return np.minimum(0,r-extent/4)*0.3
+    # Rolling hills with a few bumps scaled to the site
+    k=2*math.pi/max(extent/3,1)
+    return 1.5*np.sin(k*x)*np.cos(0.7*k*y)+0.5*np.sin(2.3*k*x+1)+0.01*x
+
+def generate_shots(n,spacing=2.0,terrain='hills',noise=0.01,seed=0):
+    """
+    Random shot positions over a square site sized for n shots spaced
+    spacing meters apart on average, with their heights on the terrain.
+    Returns an (n, 3) array.
+    """
+    rng=np.random.default_rng(seed)
+    extent=spacing*math.sqrt(n)
+    x=rng.uniform(0,extent,n)
+    y=rng.uniform(0,extent,n)
+    z=terrain_height(x,y,terrain,extent)+rng.normal(0,noise,n)
+    return np.column_stack((x,y,z))
+
+def make_survey(filename,n,spacing=2.0,terrain='hills',noise=0.01,junk_fraction=0.01,note_fraction=0.05,zero=1.5,seed=0):
+    """
+    Write a survey of n shots from generate_shots() to filename. MTEXTs hold
+    level readings relative to zero, so heights are zero-reading as
+    level_to_contour expects without -p. Returns the shots.
+    """
+    shots=generate_shots(n,spacing,terrain,noise,seed)
+    x,y,z=shots.T
+    readings=zero-z
+    rng=np.random.default_rng(seed+1)
+    # Labels sit just next to their point, well within the shot spacing
+    angle=rng.uniform(0,2*math.pi,n)
+    distance=rng.uniform(0.03,0.1,n)*spacing
+    label_x=x+distance*np.cos(angle)
+    label_y=y+distance*np.sin(angle)
+    notes=rng.random(n)<note_fraction
+
+    doc=ezdxf.new('R2004')
+    msp=doc.modelspace()
+    for i in range(n):
+        msp.add_point((x[i],y[i]))
+        text='%.3f'%readings[i]
+        if(notes[i]):
+            text+='\\Pedge of slab'
+        msp.add_mtext(text,dxfattribs={'insert':(label_x[i],label_y[i]),'char_height':0.2})
+    junk=rng.integers(0,n,int(n*junk_fraction))
+    for i in junk:
+        msp.add_mtext(rng.choice(['TBM','PLOT 12','%%p0.00 ref','see note']),
+                      dxfattribs={'insert':(x[i]+spacing/3,y[i]+spacing/3),'char_height':0.2})
+    doc.saveas(filename)
+    return shots
+
+if(__name__=="__main__"):
+    parser=argparse.ArgumentParser(prog='make_survey',description='Write a synthetic POINT + MTEXT survey DXF for benchmarks.')
+    parser.add_argument('output_file',type=str,help='DXF file to write')
+    parser.add_argument('-n','--shots',type=int,default=1000,help='Number of survey shots')
+    parser.add_argument('--spacing',type=float,default=2.0,help='Average distance between shots (meters)')
+    parser.add_argument('--terrain',choices=TERRAINS,default='hills',help='Shape of the ground')
+    parser.add_argument('--noise',type=float,default=0.01,help='Standard deviation of the reading noise (meters)')
+    parser.add_argument('--junk_fraction',type=float,default=0.01,help='Non-numeric MTEXTs per shot')
+    parser.add_argument('--note_fraction',type=float,default=0.05,help='Fraction of labels with a note on a second line')
+    parser.add_argument('-z','--zero',type=float,default=1.5,help='Level reading at the zero point')
+    parser.add_argument('--seed',type=int,default=0,help='Random seed')
+    args=parser.parse_args()
+    make_survey(args.output_file,args.shots,args.spacing,args.terrain,args.noise,args.junk_fraction,args.note_fraction,args.zero,args.seed)
+    print('[+] Wrote %d shots to \033[34m%s\033[0m'%(args.shots,args.output_file))
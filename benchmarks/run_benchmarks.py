@@ -0,0 +1,124 @@
+###############################################################################
+##                                                                           ##
+##       Benchmarks for level_to_contour and surf2stl                        ##
+##                                                                           ##
+###############################################################################
+
+# Generates synthetic surveys of increasing size, then times
+#   - the full level_to_contour.py pipeline (run as a separate process, so
+#     import time counts too) with its --profile stage breakdown
+#   - surf2stl.write on the interpolation grid
+#   - surf2stl.tri_write on the triangulated survey points
+# for every combination of shot count and --resolution. Results are written
+# as JSON so runs of different versions can be compared.
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+BENCHMARK_DIR=os.path.dirname(os.path.abspath(__file__))
+REPO_DIR=os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0,REPO_DIR)
+
+import surf2stl
+import triangulation
+from scipy.spatial import Delaunay
+from make_survey import generate_shots,make_survey
+
+def git_version():
+    try:
+        return subprocess.run(['git','describe','--always','--dirty'],cwd=REPO_DIR,
+                              capture_output=True,text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+def best_time(function,repeat):
+    # Best of repeat runs, the least disturbed by whatever else the machine does
+    times=[]
+    for _ in range(repeat):
+        start=time.perf_counter()
+        function()
+        times.append(time.perf_counter()-start)
+    return min(times)
+
+def bench_pipeline(survey,resolution,workdir,extra_args):
+    output=os.path.join(workdir,'out')
+    profile=os.path.join(workdir,'profile.json')
+    command=[sys.executable,os.path.join(REPO_DIR,'level_to_contour.py'),survey,
+             '-r',str(resolution),'-o',output,'--overwrite','always','--no-cache',
+             '--profile','--profile_json',profile]+extra_args
+    start=time.perf_counter()
+    subprocess.run(command,cwd=workdir,check=True,stdout=subprocess.DEVNULL,stdin=subprocess.DEVNULL)
+    seconds=time.perf_counter()-start
+    with open(profile) as f:
+        stages=json.load(f)
+    return {'seconds':seconds,'stages':stages['stages'],'counts':stages['counts'],
+            'dxf_bytes':os.path.getsize(output+'.dxf')}
+
+def bench_stl(shots,resolution,workdir,repeat):
+    x,y,z=shots.T
+    x_new=np.arange(np.floor(x.min()),np.ceil(x.max())+resolution,resolution)
+    y_new=np.arange(np.floor(y.min()),np.ceil(y.max())+resolution,resolution)
+    weights=triangulation.build_weights(x,y,x_new,y_new)
+    Z=triangulation.interpolate(z,weights,(len(y_new),len(x_new)))
+    filename=os.path.join(workdir,'bench.stl')
+    tri=Delaunay(np.column_stack((x,y)))
+
+    grid=best_time(lambda: surf2stl.write(filename,x_new,y_new,Z),repeat)
+    grid_bytes=os.path.getsize(filename)
+    tin=best_time(lambda: surf2stl.tri_write(filename,x,y,z,tri),repeat)
+    return [
+        {'benchmark':'stl_write','grid_cells':int(Z.size),'seconds':grid,'stl_bytes':grid_bytes},
+        {'benchmark':'stl_tri_write','triangles':int(len(tri.simplices)),'seconds':tin,'stl_bytes':os.path.getsize(filename)},
+    ]
+
+if(__name__=="__main__"):
+    parser=argparse.ArgumentParser(prog='run_benchmarks',description='Time level_to_contour and surf2stl on synthetic surveys.')
+    parser.add_argument('-n','--shots',type=int,nargs='+',default=[500,5000,50000],help='Survey sizes to run')
+    parser.add_argument('-r','--resolutions',type=float,nargs='+',default=[0.5,0.25],help='Interpolation grid resolutions to run')
+    parser.add_argument('--spacing',type=float,default=2.0,help='Average distance between shots (meters)')
+    parser.add_argument('--terrain',type=str,default='hills',help='Terrain of the generated surveys, see make_survey.py')
+    parser.add_argument('--repeat',type=int,default=3,help='Runs of each stl benchmark, the best one is kept')
+    parser.add_argument('--workdir',type=str,default=os.path.join(BENCHMARK_DIR,'work'),help='Where surveys and outputs are written')
+    parser.add_argument('-o','--output',type=str,default='benchmark_results.json',help='JSON file the results are written to')
+    parser.add_argument('--skip_stl',action='store_true',default=False,help='Only time the pipeline')
+    parser.add_argument('extra_args',nargs=argparse.REMAINDER,help='Options passed on to level_to_contour.py, after --')
+    args=parser.parse_args()
+    extra_args=[a for a in args.extra_args if a!='--']
+    os.makedirs(args.workdir,exist_ok=True)
+
+    results=[]
+    for n in args.shots:
+        survey=os.path.join(args.workdir,'survey_%s_%g_%d.dxf'%(args.terrain,args.spacing,n))
+        if(not os.path.isfile(survey)):
+            print('[+] Generating %d shot survey...'%n)
+            make_survey(survey,n,spacing=args.spacing,terrain=args.terrain)
+        shots=generate_shots(n,spacing=args.spacing,terrain=args.terrain)
+        for resolution in args.resolutions:
+            print('[i] %d shots at %.2fm resolution'%(n,resolution))
+            row={'benchmark':'pipeline','shots':n,'resolution':resolution,'extra_args':extra_args}
+            row.update(bench_pipeline(survey,resolution,args.workdir,extra_args))
+            results.append(row)
+            print('    pipeline      %8.3fs'%row['seconds'])
+            if(not args.skip_stl):
+                for row in bench_stl(shots,resolution,args.workdir,args.repeat):
+                    row.update({'shots':n,'resolution':resolution})
+                    results.append(row)
+                    print('    %-13s %8.3fs'%(row['benchmark'],row['seconds']))
+
+    with open(args.output,'w') as f:
+        json.dump({
+            'version':git_version(),
+            'date':datetime.datetime.now().isoformat(timespec='seconds'),
+            'python':platform.python_version(),
+            'numpy':np.__version__,
+            'machine':platform.platform(),
+            'results':results,
+        },f,indent=2)
+    print('[+] Results written to \033[34m%s\033[0m'%args.output)
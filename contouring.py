@@ -0,0 +1,346 @@
+### contouring.py --- Contour lines of the interpolated surface ---
+
+### Every contouring function here returns the contours as a list of
+### (level, [vertex arrays]), one (n, 2) array per polyline.
+
+import numpy as np
+
+def grid_contours(x, y, Z, levels):
+    """
+    Contour the interpolated grid with contourpy, without going through
+    matplotlib. x, y are the grid axes (1-dimensional) or the meshgrid of
+    them, NaN heights in Z are left out. Returns a list of
+    (level, [vertex arrays]).
+    """
+    import contourpy
+
+    # Same algorithm and corner masking as plt.contour, so the lines do not change
+    generator = contourpy.contour_generator(x, y, np.ma.masked_invalid(Z), name='mpl2014',
+                                            corner_mask=True, line_type=contourpy.LineType.SeparateCode)
+    return [(level, [seg for seg in generator.lines(level)[0] if len(seg) > 1]) for level in levels]
+
+def tin_contours(x, y, z, triangles, levels):
+    """
+    Contour the triangulated survey points directly, the surface being linear
+    on each triangle. Returns a list of (level, [vertex arrays]).
+
+    Each triangle that straddles a level holds one piece of contour between
+    two of its edges. Pieces are chained through the edges they share with
+    the neighbouring triangles, open lines starting from the convex hull.
+    """
+    triangles = np.asarray(triangles)
+    # Number the unique edges and keep the three edge numbers of each triangle
+    edges = np.sort(triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges, triangle_edges = np.unique(edges, axis=0, return_inverse=True)
+    triangle_edges = triangle_edges.reshape(-1, 3)
+
+    contours = []
+    for level in levels:
+        above = z > level
+        crossed = above[edges[:, 0]] != above[edges[:, 1]]
+        triangle_crossed = crossed[triangle_edges]
+        straddling = triangle_crossed.sum(axis=1) == 2
+        pieces = triangle_edges[straddling][triangle_crossed[straddling]].reshape(-1, 2)
+        if len(pieces) == 0:
+            contours.append((level, []))
+            continue
+
+        # Where the level crosses each crossed edge
+        a, b = edges[:, 0], edges[:, 1]
+        t = np.zeros(len(edges))
+        t[crossed] = (level - z[a[crossed]]) / (z[b[crossed]] - z[a[crossed]])
+        points = np.column_stack((x[a] + t * (x[b] - x[a]), y[a] + t * (y[b] - y[a])))
+        contours.append((level, local_chain_pieces(pieces, len(edges), points)))
+    return contours
+
+def stitch_segments(segments, tolerance):
+    """
+    Join polylines whose end points coincide (within tolerance) into
+    continuous polylines, closing rings that come back to their start.
+    Used to merge contours that were traced separately on adjacent tiles.
+    """
+    closed = []
+    open_segments = []
+    for seg in segments:
+        if np.allclose(seg[0], seg[-1], rtol=0, atol=tolerance):
+            closed.append(seg)
+        else:
+            open_segments.append(seg)
+
+    def key(p):
+        return tuple(np.round(np.asarray(p) / tolerance).astype(np.int64))
+
+    # End point -> [(segment index, 0 for start or -1 for end)]
+    ends = {}
+    for i, seg in enumerate(open_segments):
+        ends.setdefault(key(seg[0]), []).append((i, 0))
+        ends.setdefault(key(seg[-1]), []).append((i, -1))
+
+    used = [False] * len(open_segments)
+
+    def next_piece(point):
+        for i, end in ends.get(key(point), []):
+            if not used[i]:
+                used[i] = True
+                seg = open_segments[i]
+                # Orient the piece so it starts at the shared point
+                return seg if end == 0 else seg[::-1]
+        return None
+
+    stitched = []
+    for i, seg in enumerate(open_segments):
+        if used[i]:
+            continue
+        used[i] = True
+        pieces = [seg]
+        piece = next_piece(seg[-1])
+        while piece is not None:
+            pieces.append(piece[1:])
+            piece = next_piece(piece[-1])
+        head = [seg]
+        piece = next_piece(seg[0])
+        while piece is not None:
+            head.insert(0, piece[::-1][:-1])
+            piece = next_piece(piece[-1])
+        line = np.concatenate(head[:-1] + pieces)
+        if len(line) > 2 and np.allclose(line[0], line[-1], rtol=0, atol=tolerance):
+            line[-1] = line[0]
+        stitched.append(line)
+    return closed + stitched
+
+def simplify_contours(contours, tolerance):
+    """
+    Douglas-Peucker simplification of every contour polyline: vertices
+    closer than tolerance (meters) to the simplified line are dropped.
+    Closed rings stay closed and keep at least three corners, two when
+    they are flat, and rings of a single point are dropped.
+    """
+    simplified = []
+    for level, segments in contours:
+        # A ring of one repeated point has nothing left to draw
+        segments = [local_simplify(seg, tolerance) for seg in segments]
+        simplified.append((level, [seg for seg in segments if len(seg) > 1]))
+    return simplified
+
+def place_labels(contours, spacing, clearance, budget=None, obstacles=None):
+    """
+    Decluttered height label positions for contours, a list of
+    (level, [vertex arrays]). Returns a list of (level, (n, 2) positions)
+    in the same order.
+
+    Candidates are taken every spacing / 4 meters along each polyline and
+    accepted from the straightest stretches to the most bent ones. A
+    candidate is rejected when it is within clearance of an accepted label
+    or of one of the obstacles ((n, 2) points, e.g. the survey points), or
+    within spacing of an accepted label of the same level. With a budget
+    the distances between labels are widened until at most budget labels
+    fit, so the label count follows the drawing area and not the number of
+    vertices.
+    """
+    scale = 1.0
+    for attempt in range(4):
+        positions, level_of, order = local_candidates(contours, spacing * scale)
+        accepted = local_declutter(positions, level_of, order, obstacles, spacing * scale, clearance * scale, clearance)
+        if not budget or len(accepted) <= budget:
+            break
+        # About one label per spacing x clearance of drawing, widen both to fit
+        scale *= np.sqrt(len(accepted) / budget)
+    if budget:
+        accepted = accepted[:budget]
+
+    accepted = np.sort(accepted)
+    return [(level, positions[accepted[level_of[accepted] == k]]) for k, (level, segments) in enumerate(contours)]
+
+# Local subfunctions
+
+def local_chain_pieces(pieces, n_edges, points):
+    # Every crossed edge is shared by at most two pieces, so each one has at
+    # most two neighbours along the contour. Edges with one neighbour lie on
+    # the hull and are the ends of open lines, the rest form rings.
+    src = np.concatenate((pieces[:, 0], pieces[:, 1]))
+    dst = np.concatenate((pieces[:, 1], pieces[:, 0]))
+    order = np.argsort(src, kind='stable')
+    src, dst = src[order], dst[order]
+    # Slot 0 for the first piece found at an edge, slot 1 for the second
+    position = np.arange(len(src))
+    first = np.ones(len(src), dtype=bool)
+    first[1:] = src[1:] != src[:-1]
+    slot = position - np.maximum.accumulate(np.where(first, position, 0))
+    neighbours = np.full((n_edges, 2), -1, dtype=np.int64)
+    neighbours[src, slot] = dst
+    degree = np.bincount(src, minlength=n_edges)
+
+    nb0 = neighbours[:, 0].tolist()
+    nb1 = neighbours[:, 1].tolist()
+    visited = np.zeros(n_edges, dtype=bool)
+    used = np.nonzero(degree)[0]
+    starts = np.concatenate((used[degree[used] == 1], used[degree[used] == 2])).tolist()
+    lines = []
+    for start in starts:
+        if visited[start]:
+            continue
+        visited[start] = True
+        path = [start]
+        current = start
+        while True:
+            step = nb0[current]
+            if step < 0 or visited[step]:
+                step = nb1[current]
+                if step < 0 or visited[step]:
+                    break
+            visited[step] = True
+            path.append(step)
+            current = step
+        if degree[start] == 2 and len(path) > 2:
+            # Rings come back to where they started
+            path.append(start)
+        line = points[path]
+        # A shot lying exactly on the level is crossed by several edges at once
+        keep = np.ones(len(line), dtype=bool)
+        keep[1:] = np.any(line[1:] != line[:-1], axis=1)
+        line = line[keep]
+        if len(line) > 1:
+            lines.append(line)
+    return lines
+
+def local_simplify(points, tolerance):
+    if len(points) < 3:
+        return points
+    if np.array_equal(points[0], points[-1]):
+        # Split a ring at its vertex farthest from the start, simplify both halves
+        far = int(np.argmax(np.hypot(*(points - points[0]).T)))
+        if far == 0:
+            return points[:1]
+        ring = np.concatenate((local_douglas_peucker(points[:far + 1], tolerance)[:-1],
+                               local_douglas_peucker(points[far:], tolerance)))
+        if len(ring) < 4:
+            # Collapsed below the tolerance, keep the widest triangle
+            side = np.abs(local_cross(points[far] - points[0], points - points[0]))
+            # On a collinear ring the widest corner is one of the others, take each once
+            ring = points[np.unique([0, far, int(np.argmax(side)), len(points) - 1])]
+        return ring
+    return local_douglas_peucker(points, tolerance)
+
+def local_douglas_peucker(points, tolerance):
+    # Iterative, the distances of each span are computed at once
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        inner = points[first + 1:last] - points[first]
+        chord = points[last] - points[first]
+        length = np.hypot(*chord)
+        if length == 0:
+            distance = np.hypot(*inner.T)
+        else:
+            distance = np.abs(local_cross(chord, inner)) / length
+        i = int(np.argmax(distance))
+        if distance[i] > tolerance:
+            k = first + 1 + i
+            keep[k] = True
+            stack.append((first, k))
+            stack.append((k, last))
+    return points[keep]
+
+def local_cross(a, b):
+    return a[0] * b[:, 1] - a[1] * b[:, 0]
+
+def local_along(segments, spacing, offset=0.0):
+    # Points every spacing meters of arc length along each polyline, and the
+    # points offset meters behind and ahead of them on the same polyline
+    segments = [np.asarray(seg, dtype=float) for seg in segments if len(seg) > 0]
+    if len(segments) == 0:
+        return np.empty((0, 2)), np.empty((0, 2)), np.empty((0, 2))
+    vertices = np.concatenate(segments)
+    counts = np.array([len(seg) for seg in segments])
+    starts = np.cumsum(counts) - counts
+
+    # Cumulative length over all vertices, without the jumps between polylines
+    steps = np.hypot(*np.diff(vertices, axis=0).T)
+    steps[starts[1:] - 1] = 0
+    distance = np.concatenate(([0.0], np.cumsum(steps)))
+    lengths = distance[starts + counts - 1] - distance[starts]
+
+    # Wanted distances: 0, spacing, 2*spacing... up to the length of each polyline
+    n_labels = np.floor(lengths / spacing).astype(np.int64) + 1
+    line = np.repeat(np.arange(len(segments)), n_labels)
+    k = np.arange(n_labels.sum()) - np.repeat(np.cumsum(n_labels) - n_labels, n_labels)
+    wanted = distance[starts[line]] + k * spacing
+
+    first = starts[line]
+    last = starts[line] + counts[line] - 1
+    at = local_point_at(vertices, distance, first, last, wanted)
+    if offset == 0:
+        return at, at, at
+    behind = local_point_at(vertices, distance, first, last, np.maximum(wanted - offset, distance[first]))
+    ahead = local_point_at(vertices, distance, first, last, np.minimum(wanted + offset, distance[last]))
+    return at, behind, ahead
+
+def local_point_at(vertices, distance, first, last, wanted):
+    # Vertex before each wanted distance, kept inside its own polyline
+    i = np.searchsorted(distance, wanted, side='right') - 1
+    i = np.clip(i, first, last)
+    j = np.minimum(i + 1, last)
+    step = distance[j] - distance[i]
+    t = np.divide(wanted - distance[i], step, out=np.zeros_like(wanted), where=step > 0)
+    return vertices[i] + t[:, None] * (vertices[j] - vertices[i])
+
+def local_turn(at, behind, ahead):
+    # Angle between the line coming into and going out of each point, the
+    # ends of open lines count as fully bent
+    a = at - behind
+    b = ahead - at
+    turn = np.abs(np.arctan2(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0], np.sum(a * b, axis=1)))
+    ends = ~(a.any(axis=1) & b.any(axis=1))
+    turn[ends] = np.pi
+    return turn
+
+def local_candidates(contours, spacing):
+    # Label candidates every spacing / 4 along the contours, their level
+    # numbers and the order to try them in
+    step = spacing / 4
+    candidates = [local_along(segments, step, step) for level, segments in contours]
+    level_of = np.repeat(np.arange(len(contours)), [len(c[0]) for c in candidates]).astype(np.int64)
+    if len(level_of) == 0:
+        return np.empty((0, 2)), level_of, level_of
+    positions = np.concatenate([c[0] for c in candidates])
+    # Turning angle at each candidate in 5 degree bins, so nearly straight
+    # stretches all count as straight and are taken in order along the line
+    turn = np.concatenate([local_turn(*c) for c in candidates])
+    return positions, level_of, np.argsort(np.round(turn / np.radians(5)), kind='stable')
+
+def local_declutter(positions, level_of, order, obstacles, spacing, clearance, obstacle_clearance):
+    # Greedy pass over the candidates in order, each accepted one blocks its
+    # neighbours. Returns the accepted indices, best first.
+    from scipy.spatial import cKDTree
+
+    blocked = np.zeros(len(positions), dtype=bool)
+    if len(positions) == 0:
+        return np.empty(0, dtype=np.int64)
+    if obstacles is not None and len(obstacles) > 0:
+        dist, _ = cKDTree(obstacles).query(positions, distance_upper_bound=obstacle_clearance)
+        blocked |= dist <= obstacle_clearance
+
+    # Pairs within clearance, then pairs of the same level within spacing:
+    # levels are set 2*spacing apart on a third axis so they never pair up
+    pairs = np.concatenate((
+        cKDTree(positions).query_pairs(clearance, output_type='ndarray').reshape(-1, 2),
+        cKDTree(np.column_stack((positions, level_of * (2.0 * spacing)))).query_pairs(spacing, output_type='ndarray').reshape(-1, 2),
+    ))
+    # Neighbours of every candidate, in compressed rows
+    src = np.concatenate((pairs[:, 0], pairs[:, 1]))
+    dst = np.concatenate((pairs[:, 1], pairs[:, 0]))
+    sorter = np.argsort(src, kind='stable')
+    dst = dst[sorter]
+    ptr = np.searchsorted(src[sorter], np.arange(len(positions) + 1))
+
+    accepted = []
+    for i in order.tolist():
+        if blocked[i]:
+            continue
+        accepted.append(i)
+        blocked[dst[ptr[i]:ptr[i+1]]] = True
+    return np.array(accepted, dtype=np.int64)
@@ -0,0 +1,169 @@
+### dxf_stream.py --- Streaming DXF input and output for large drawings ---
+
+### Reading: only the POINT and MTEXT entities of the modelspace and the
+### lines that may be section alignments are built, everything else
+### (blocks, xrefs, hatches...) is skipped while the file is streamed.
+###
+### Writing: the generated entities are collected in a small scratch
+### document and spliced into a copy of the input file, right before the end
+### of its ENTITIES section. The input is copied in chunks, so the full
+### drawing is never loaded. The new entities get handles after the highest
+### handle in the input and $HANDSEED is moved past them.
+
+import os
+import re
+from collections import OrderedDict
+from io import StringIO
+import numpy as np
+import ezdxf
+from ezdxf.addons import iterdxf
+from ezdxf.lldxf import fileindex
+from ezdxf.lldxf.tagwriter import TagWriter
+from ezdxf.tools.handle import HandleGenerator
+import sections
+
+COPY_CHUNK_SIZE = 1 << 20
+
+# Surveys read by long running processes (server.py) are kept while the file
+# does not change, least recently used first out. 0 keeps nothing.
+READ_CACHE_SIZE = 0
+read_cache = OrderedDict()
+
+HANDSEED_PATTERN = re.compile(rb'(\$HANDSEED\s*\r?\n\s*5\r?\n)([0-9A-Fa-f]+)')
+
+def read_survey(filename, section_layer='SECTION', skip_layers=()):
+    """
+    Stream the modelspace of a DXF file and pull out the survey entities.
+
+    Returns (points, texts, alignments) where points is an (n, 2) array of
+    POINT locations, texts a list of (x, y, plain text) for each MTEXT and
+    alignments the sections drawn on section_layer, see
+    sections.read_alignments. MTEXTs on skip_layers are left out.
+    """
+    skip_layers = set(layer.upper() for layer in skip_layers)
+    if READ_CACHE_SIZE > 0:
+        status = os.stat(filename)
+        key = (os.path.abspath(filename), status.st_mtime_ns, status.st_size, section_layer.upper(), frozenset(skip_layers))
+        if key in read_cache:
+            read_cache.move_to_end(key)
+            return read_cache[key]
+        survey = local_read_survey(filename, section_layer, skip_layers)
+        read_cache[key] = survey
+        while len(read_cache) > READ_CACHE_SIZE:
+            read_cache.popitem(last=False)
+        return survey
+    return local_read_survey(filename, section_layer, skip_layers)
+
+def new_overlay(filename):
+    """
+    Scratch document for the entities that will be appended to filename,
+    of the same DXF version as the input.
+    """
+    version = fileindex.load(filename).version
+    return ezdxf.new(ezdxf.const.acad_release.get(version, 'R2004'))
+
+def save_overlay(overlay, input_file, output_file):
+    """
+    Write a copy of input_file to output_file with the modelspace entities
+    of the overlay document appended to its ENTITIES section.
+    """
+    structure = fileindex.load(input_file)
+    index = structure.index
+    handles = [int(e.value, 16) for e in index if e.code == 5 and re.fullmatch('[0-9A-Fa-f]+', e.value)]
+    header_start, header_end = local_section_range(index, 'HEADER')
+    _, entities_end = local_section_range(index, 'ENTITIES')
+
+    with open(input_file, 'rb') as src:
+        src.seek(header_start)
+        header = src.read(header_end - header_start)
+        match = HANDSEED_PATTERN.search(header)
+        seed = max([int(match.group(2), 16) if match else 1] + [h + 1 for h in handles])
+
+        text = StringIO()
+        writer = TagWriter(text, structure.version, write_handles=bool(handles))
+        generator = HandleGenerator('%X' % seed)
+        owner = local_modelspace_handle(src, index)
+        for entity in overlay.modelspace():
+            local_rehandle(entity, generator, owner)
+            # POLYLINE exports its VERTEX and SEQEND entities along with itself
+            entity.export_dxf(writer)
+        if match:
+            header = header[:match.start(2)] + str(generator).encode('ascii') + header[match.end(2):]
+
+        with open(output_file, 'wb') as dst:
+            src.seek(0)
+            local_copy(src, dst, header_start)
+            dst.write(header)
+            src.seek(header_end)
+            local_copy(src, dst, entities_end - header_end)
+            dst.write(text.getvalue().encode(structure.encoding, errors='surrogateescape'))
+            local_copy(src, dst, None)
+
+# Local subfunctions
+
+def local_read_survey(filename, section_layer, skip_layers):
+    points = []
+    texts = []
+    lines = []
+    for entity in iterdxf.modelspace(filename, types=['POINT', 'MTEXT'] + list(sections.ALIGNMENT_TYPES)):
+        kind = entity.dxftype()
+        if kind == 'POINT':
+            location = entity.dxf.location
+            points.append((location.x, location.y))
+        elif kind == 'MTEXT':
+            if entity.dxf.layer.upper() in skip_layers:
+                continue
+            insert = entity.dxf.insert
+            texts.append((insert.x, insert.y, entity.plain_text()))
+        else:
+            lines.append(entity)
+    return np.array(points, dtype=float).reshape(-1, 2), texts, sections.read_alignments(lines, section_layer)
+
+def local_section_range(index, name):
+    # File locations of the (0, SECTION) tag of a section and of its (0, ENDSEC) tag
+    for i, entry in enumerate(index):
+        if entry.code == 2 and entry.value == name:
+            start = index[i - 1].location
+            for end_entry in index[i:]:
+                if end_entry.code == 0 and end_entry.value == 'ENDSEC':
+                    return start, end_entry.location
+    raise ezdxf.DXFStructureError('%s section not found' % name)
+
+def local_modelspace_handle(f, index):
+    # Handle of the *Model_Space BLOCK_RECORD, the owner of modelspace entities
+    for entry in index:
+        if entry.code == 0 and entry.value == 'BLOCK_RECORD':
+            f.seek(entry.location)
+            f.readline()
+            f.readline()
+            handle = None
+            while True:
+                code = int(f.readline())
+                value = f.readline().rstrip(b'\r\n').decode('ascii', errors='replace')
+                if code == 0:
+                    break
+                if code == 5:
+                    handle = value
+                elif code == 2 and value.upper() == '*MODEL_SPACE':
+                    return handle
+    return '0'
+
+def local_rehandle(entity, generator, owner):
+    entity.dxf.handle = generator.next()
+    entity.dxf.owner = owner
+    if entity.dxftype() == 'POLYLINE':
+        for vertex in entity.vertices:
+            vertex.dxf.handle = generator.next()
+            vertex.dxf.owner = entity.dxf.handle
+        entity.seqend.dxf.handle = generator.next()
+        entity.seqend.dxf.owner = entity.dxf.handle
+
+def local_copy(src, dst, size):
+    # Copy size bytes (or everything left if None) without holding them all in memory
+    while size is None or size > 0:
+        data = src.read(COPY_CHUNK_SIZE if size is None else min(size, COPY_CHUNK_SIZE))
+        if not data:
+            break
+        dst.write(data)
+        if size is not None:
+            size -= len(data)
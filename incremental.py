@@ -0,0 +1,99 @@
+### incremental.py --- Re-runs that only redo what new readings changed ---
+
+### After a run the points, their triangulation and the interpolated grid
+### are kept in a snapshot. On the next run the triangles that differ
+### between the old and the new triangulation (added, removed or with a
+### vertex whose height changed) are the only places where the surface can
+### have changed, so only the grid window around them is interpolated
+### again. The generated entities of the previous run are removed from the
+### drawing before the new ones are added, so nothing is duplicated.
+
+import hashlib
+import os
+import numpy as np
+import triangulation
+
+# Where snapshots go when no --cache_dir is given
+SNAPSHOT_DIR = '.levler_cache'
+
+def snapshot_path(cache_dir, input_file, resolution):
+    """Snapshot file in cache_dir for a survey file and grid resolution."""
+    key = hashlib.sha1(('%s|%r' % (os.path.abspath(input_file), float(resolution))).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, 'snap_%s.npz' % key)
+
+def load_snapshot(path):
+    """The snapshot saved at path as a dict, or None if there is none."""
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as snapshot:
+        return {name: snapshot[name] for name in snapshot.files}
+
+def save_snapshot(path, points, triangles, x_new, y_new, Z):
+    """Keep the (n, 3) points, their triangles and the grid for the next run."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Same write and rename as the triangulation cache
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, points=points, triangles=triangles, x_new=x_new, y_new=y_new, Z=Z)
+    os.replace(tmp_path, path)
+
+def changed_points(old_points, points):
+    """Number of points added, removed or with a different height."""
+    # Rows in one survey and not the other, repeated rows counted as often as they occur
+    rows, inverse = np.unique(np.vstack((old_points, points)), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    old_counts = np.bincount(inverse[:len(old_points)], minlength=len(rows))
+    new_counts = np.bincount(inverse[len(old_points):], minlength=len(rows))
+    removed = np.maximum(old_counts - new_counts, 0)
+    added = np.maximum(new_counts - old_counts, 0)
+    # A new height at the same x, y removes one row and adds another, count it once
+    _, xy = np.unique(rows[:, :2], axis=0, return_inverse=True)
+    xy = xy.ravel()
+    return int(np.maximum(np.bincount(xy, weights=removed), np.bincount(xy, weights=added)).sum())
+
+def changed_window(old_points, old_triangles, points, triangles, x_new, y_new):
+    """
+    Grid window (i0, i1, j0, j1), inclusive node ranges along x_new and
+    y_new, covering every triangle that is not in both triangulations.
+    Returns None when the surface did not change.
+    """
+    # Compare triangles by the x, y, z of their corners, not by point numbers
+    _, ids = np.unique(np.vstack((old_points, points)), axis=0, return_inverse=True)
+    ids = ids.ravel()
+    old_ids = np.sort(ids[:len(old_points)][old_triangles], axis=1)
+    new_ids = np.sort(ids[len(old_points):][triangles], axis=1)
+    _, first, counts = np.unique(np.vstack((old_ids, new_ids)), axis=0, return_index=True, return_counts=True)
+    differing = np.vstack((old_points[old_triangles], points[triangles]))[first[counts == 1]]
+    if len(differing) == 0:
+        return None
+
+    corners = differing[:, :, :2].reshape(-1, 2)
+    low = corners.min(axis=0)
+    high = corners.max(axis=0)
+    i0 = max(np.searchsorted(x_new, low[0], side='right') - 1, 0)
+    i1 = min(np.searchsorted(x_new, high[0], side='left'), len(x_new) - 1)
+    j0 = max(np.searchsorted(y_new, low[1], side='right') - 1, 0)
+    j1 = min(np.searchsorted(y_new, high[1], side='left'), len(y_new) - 1)
+    return i0, i1, j0, j1
+
+def update_window(Z, x, y, z, x_new, y_new, window, tri=None):
+    """
+    Interpolate the points again on the nodes of the window of Z, in place.
+    tri is the scipy Delaunay of (x, y) when the caller already has it.
+    """
+    i0, i1, j0, j1 = window
+    X, Y = np.meshgrid(x_new[i0:i1+1], y_new[j0:j1+1])
+    weights = triangulation.point_weights(x, y, X, Y, tri=tri)
+    Z[j0:j1+1, i0:i1+1] = triangulation.interpolate(z, weights, X.shape)
+
+def remove_generated(msp, layers):
+    """Delete the modelspace entities on the given layers, returns how many."""
+    layers = set(layer.upper() for layer in layers)
+    generated = [e for e in msp if e.dxf.layer.upper() in layers]
+    db = msp.doc.entitydb
+    for entity in generated:
+        db.delete_entity(entity)
+    # Drop the deleted entities from the modelspace in one pass
+    msp.purge()
+    db.purge()
+    return len(generated)
@@ -11,18 +11,30 @@ import argparse
 import ezdxf
 import os
 import math
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
-from scipy.interpolate import griddata
+import triangulation
+import contouring
+import sections
+import point_io
+import incremental
+import outputs
+import profiler
 
 # TODO: Automatic sections x y
 
-def euclidean_distance(p, q):
-    return math.sqrt(sum([(p[i] - q[i]) ** 2 for i in range(2)]))
+verbose=False
+
+# Layers of everything the program adds to the drawing, --incremental replaces them
+CONTOUR_LAYER='CONTOURS'
+CONTOUR_LABEL_LAYER='CONTOURHEIGHTS'
+POINT_LABEL_LAYER='POINTHEIGHTS'
+SECTION_OUTPUT_LAYER='SECTIONPROFILES'
+DIFF_CONTOUR_LAYER='DIFFCONTOURS'
+DIFF_LABEL_LAYER='DIFFHEIGHTS'
+GENERATED_LAYERS=(CONTOUR_LAYER,CONTOUR_LABEL_LAYER,POINT_LABEL_LAYER,SECTION_OUTPUT_LAYER,DIFF_CONTOUR_LAYER,DIFF_LABEL_LAYER)
 
 def print_if_verbose(stuff):
-    if(args.verbose):
+    if(verbose):
         print(stuff)
 
 def my_floor(num,resolution):
@@ -33,9 +45,207 @@ def my_ceil(num,resolution):
     nearest_up=np.ceil((num/resolution))*resolution
     return nearest_up.astype(np.int64)
 
-if(__name__=="__main__"):
+def grid_axes(min_x,max_x,min_y,max_y,resolution):
+    # Axes of the interpolation grid between the snapped extents
+    x_subdivisions=((max_x-min_x+resolution)/resolution).astype(np.int64)
+    y_subdivisions=((max_y-min_y+resolution)/resolution).astype(np.int64)
+    return np.linspace(min_x, max_x, x_subdivisions),np.linspace(min_y, max_y, y_subdivisions)
+
+def match_labels_to_points(points, labels, max_distance=None, candidates=3):
+    """
+    Pair each label position with a POINT position, at most one label per point.
+
+    Labels are matched to their nearest point first. When several labels
+    claim the same point the closest one keeps it and the others fall back
+    to their next nearest points that are still free, up to `candidates`
+    neighbours deep. Labels further than `max_distance` from any point are
+    left unmatched.
+
+    Returns (label_index, point_index, contested, orphan_labels, orphan_points)
+    where the first two are aligned index arrays of the matched pairs,
+    contested holds the indices of points that were the nearest point of
+    more than one label, and the orphan arrays hold unmatched indices.
+    """
+    from scipy.spatial import cKDTree
+
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    labels = np.asarray(labels, dtype=float).reshape(-1, 2)
+    n_points = points.shape[0]
+    n_labels = labels.shape[0]
+    label_point = np.full(n_labels, -1, dtype=np.int64)
+    point_label = np.full(n_points, -1, dtype=np.int64)
+    contested = np.empty(0, dtype=np.int64)
+
+    if n_points > 0 and n_labels > 0:
+        k = min(candidates, n_points)
+        bound = np.inf if max_distance is None else max_distance
+        dist, idx = cKDTree(points).query(labels, k=k, distance_upper_bound=bound)
+        dist = dist.reshape(n_labels, k)
+        idx = idx.reshape(n_labels, k)
+
+        # Points that are the nearest neighbour of more than one label
+        nearest = idx[:, 0][idx[:, 0] < n_points]
+        claims = np.bincount(nearest, minlength=n_points)
+        contested = np.nonzero(claims > 1)[0]
+
+        # Each round offers every unmatched label its next candidate point and
+        # hands each free point to the closest label asking for it
+        for col in range(k):
+            lab = np.nonzero(label_point == -1)[0]
+            cand = idx[lab, col]
+            ok = cand < n_points  # cKDTree returns n_points for "nothing within bound"
+            lab, cand, d = lab[ok], cand[ok], dist[lab[ok], col]
+            free = point_label[cand] == -1
+            lab, cand, d = lab[free], cand[free], d[free]
+            if lab.size == 0:
+                continue
+            order = np.lexsort((d, cand))
+            cand_sorted = cand[order]
+            first = np.ones(order.size, dtype=bool)
+            first[1:] = cand_sorted[1:] != cand_sorted[:-1]
+            winners = order[first]
+            label_point[lab[winners]] = cand[winners]
+            point_label[cand[winners]] = lab[winners]
+
+    label_index = np.nonzero(label_point != -1)[0]
+    point_index = label_point[label_index]
+    orphan_labels = np.nonzero(label_point == -1)[0]
+    orphan_points = np.nonzero(point_label == -1)[0]
+    return label_index, point_index, contested, orphan_labels, orphan_points
+
+def add_pline(msp,vertices,dxfattribs):
+    # One LWPOLYLINE holding all the vertices, old R12 drawings only have POLYLINE
+    if(msp.doc.dxfversion>ezdxf.const.DXF12):
+        return msp.add_lwpolyline(vertices, format='xy', dxfattribs=dxfattribs)
+    return msp.add_polyline2d(vertices, dxfattribs=dxfattribs)
+
+def add_grid_sections(msp,sample,min_x,max_x,min_y,max_y,section_dist,step,height_range):
+    """
+    Draw x and y aligned sections through the surface every section_dist
+    meters, with their markers on the plan.
+    """
+    # Make list of where sections will be drawn
+    sections_x=list(range(min_x,max_x+section_dist,section_dist))
+    print_if_verbose("[i] Making sections at x coordinate: "+str(sections_x))
+    sections_y=list(range(min_y,max_y+section_dist,section_dist))
+    print_if_verbose("[i] Making sections at y coordinate: "+str(sections_y))
+
+    def section_name(type,n):
+        if(type=='letter'):
+            if n <= 0:
+                ...
+                #throw exception
+
+            alphabet = "abcdefghijklmnopqrstuvwxyz"
+            result = ""
+
+            while n > 0:
+                remainder = (n - 1) % 26
+                result = alphabet[remainder] + result
+                n = (n - 1) // 26 
+
+            return result   
+        else:
+            return n
+
+    # Vertical sections run along y, horizontal ones along x
+    alignments=[]
+    starts=[]
+    for section_num,sex in enumerate(sections_x,1):
+        alignments.append((section_name('letter',section_num),np.array([[sex,min_y],[sex,max_y]],dtype=float)))
+        starts.append(min_y)
+
+        # Add section icons to main drawing
+        anno_art1=add_pline(msp,[[sex,min_y],[sex,min_y-2],[sex+0.5,min_y-2],[sex+0.2,min_y-1.8]],{'layer':SECTION_OUTPUT_LAYER,'color':2})
+        anno_art2=add_pline(msp,[[sex,max_y],[sex,max_y+2],[sex+0.5,max_y+2],[sex+0.2,max_y+1.8]],{'layer':SECTION_OUTPUT_LAYER,'color':2})
+        anno_letter1=msp.add_mtext(section_name('letter',section_num), dxfattribs={'layer':SECTION_OUTPUT_LAYER,'char_height': 0.3,'color': 2})
+        anno_letter1.set_location(tuple([sex,min_y]))
+        anno_letter2=msp.add_mtext(section_name('letter',section_num), dxfattribs={'layer':SECTION_OUTPUT_LAYER,'char_height': 0.3,'color': 2})
+        anno_letter2.set_location(tuple([sex,max_y]))
+
+    for section_num,sey in enumerate(sections_y,1):
+        alignments.append((section_name('number',section_num),np.array([[min_x,sey],[max_x,sey]],dtype=float)))
+        starts.append(min_x)
+
+        # Add section icons to main drawing
+        anno_art1=add_pline(msp,[[min_x,sey],[min_x-2,sey],[min_x-2,sey+0.5],[min_x-1.8,sey+0.2]],{'layer':SECTION_OUTPUT_LAYER,'color':3})
+        anno_art1=add_pline(msp,[[max_x,sey],[max_x+2,sey],[max_x+2,sey+0.5],[max_x+1.8,sey+0.2]],{'layer':SECTION_OUTPUT_LAYER,'color':3})
+        anno_letter1=msp.add_mtext(section_name('number',section_num), dxfattribs={'layer':SECTION_OUTPUT_LAYER,'char_height': 0.3,'color': 2})
+        anno_letter1.set_location(tuple([min_x,sey]))
+        anno_letter2=msp.add_mtext(section_name('number',section_num), dxfattribs={'layer':SECTION_OUTPUT_LAYER,'char_height': 0.3,'color': 2})
+        anno_letter2.set_location(tuple([max_x,sey]))
+
+    # The grid sections are drawn against the plan coordinate instead of the chainage
+    profiles=sections.sample_profiles(alignments,step,sample)
+    profiles=[(name,chainage+start,heights) for (name,chainage,heights),start in zip(profiles,starts)]
+    add_section_profiles(msp,profiles,height_range)
+
+def add_alignment_sections(msp,alignments,sample,step,height_range):
+    """
+    Draw the sections along (name, vertices) alignments, named at both ends
+    on the plan.
+    """
+    for name,vertices in alignments:
+        for end in (vertices[0],vertices[-1]):
+            msp.add_mtext(str(name), dxfattribs={'layer':SECTION_OUTPUT_LAYER,'char_height': 0.3,'color': 2,'insert': (end[0],end[1])})
+    add_section_profiles(msp,sections.sample_profiles(alignments,step,sample),height_range)
+
+def add_section_profiles(msp,profiles,height_range):
+    # Make pline with these lists at an empty space in the dxf
+    # This will be used to set the vertical spacing between sections
+    offset=-10
+    print_if_verbose("[i] Max height difference in input"+str(height_range))
+    for section,distance,heights in profiles:
+        color_index=np.random.randint(1,255)
+        print_if_verbose("[i] Drawing section "+str(section)+"-"+str(section))
+        # One pline for every stretch of the section that is on the surface
+        inside=np.concatenate(([0],~np.isnan(heights),[0])).astype(np.int8)
+        for start,stop in np.flatnonzero(np.diff(inside)).reshape(-1,2):
+            if(stop-start>1):
+                sect_pline = add_pline(msp,np.column_stack((distance[start:stop],heights[start:stop]+offset)),{'layer':SECTION_OUTPUT_LAYER,'color':color_index})
+
+        # ENHANCEMENT: add dashed line to show where nearest integer height to minimum point is (currently shows 0 point)
+        sect_reference=add_pline(msp,[[0,offset],[10,offset]],{'layer':SECTION_OUTPUT_LAYER,'color':color_index})
+        sect_ref_mtext = msp.add_mtext("%%p0.00", dxfattribs={'layer':SECTION_OUTPUT_LAYER,'char_height': 0.3,'color': color_index})
+        sect_ref_mtext.set_location(tuple([0,offset]))
+
+        # ENHANCEMENT: center text under section with its name
+        sect_name_mtext=msp.add_mtext("Section "+str(section), dxfattribs={'layer':SECTION_OUTPUT_LAYER,'char_height': 0.3,'color': color_index})
+        sect_name_mtext.set_location(tuple([5,offset-1]))
+
+        # Draw the next line more down
+        offset-=5+height_range
+
+def positive_float(text):
+    # argparse type for distances that cannot be 0
+    value=float(text)
+    if(not value>0):
+        raise argparse.ArgumentTypeError('%s is not a positive number'%text)
+    return value
+
+def non_negative_float(text):
+    # argparse type for distances where 0 turns the feature off
+    value=float(text)
+    if(not value>=0):
+        raise argparse.ArgumentTypeError('%s is negative'%text)
+    return value
+
+def positive_int(text):
+    # argparse type for counts that cannot be 0
+    value=int(text)
+    if(value<=0):
+        raise argparse.ArgumentTypeError('%s is not a positive number'%text)
+    return value
+
+def non_negative_int(text):
+    value=int(text)
+    if(value<0):
+        raise argparse.ArgumentTypeError('%s is negative'%text)
+    return value
+
+def build_parser(prog='level_to_contour'):
     # Create an argument parser
-    parser = argparse.ArgumentParser( prog='level_to_contour',
+    parser = argparse.ArgumentParser( prog=prog,
                     description="""
 Adds to a dxf file with POINTs and MTEXTs the contours. 
 To make such a dxf file, use the acad.dwt template, insert your plot outline 
@@ -44,91 +254,233 @@ POINT command to place a point and then use MTEXT to add the automatic level
 reading next to the point. You can add notes on the second line of the MTEXT 
 if you want, the program will only consider the first line as a value. Repeat 
 for all readings. Save the file as 2004 dxf. It is recommended to rotate the 
-plot such that the sections you want are in the x and y directions.
+plot such that the sections you want are in the x and y directions, or to
+draw the section lines as polylines on the SECTION layer.
 """)
-    parser.add_argument('input_file', type=str,help='input file name (required)')
+    parser.add_argument('input_file', type=str,help='input file name (required), a DXF or x,y,z points in a .csv, .xyz, .txt or .npy file')
     parser.add_argument('-z', '--zero', type=float, action='store', default=0,help='level reading at your zero point')
     parser.add_argument('-o', '--output_file', type=str,help='output file name without extension')
     parser.add_argument('-s', '--show_3d', action='store_true', default=False,help='Show a 3d model of the interpolation')
     parser.add_argument('-c', '--export_csv', action='store_true', default=False,help='Export a csv as well')
     parser.add_argument('--csv_only', action='store_true', default=False,help='Export only the csv')
-    parser.add_argument('-d', '--contour_z_distance', type=float, default=0.5,help='Contour z distance')
+    parser.add_argument('-d', '--contour_z_distance', type=positive_float, default=0.5,help='Contour z distance')
     parser.add_argument('-p', '--pre_calculated_z', action='store_true', default=False,help='Use this if MTEXTS of dxf contain heights instead of readings.')
-    parser.add_argument('-r', '--resolution', type=int, default=0.25,help='Interpolation grid distance between points (meters)')
+    parser.add_argument('-r', '--resolution', type=positive_float, default=0.25,help='Interpolation grid distance between points (meters)')
+    parser.add_argument('--simplify', type=non_negative_float, default=0,help='Drop contour vertices closer than this to the simplified line (meters), 0 to keep them all')
+    parser.add_argument('--label_spacing', type=positive_float, default=10,help='Least distance between height labels of the same contour level (meters)')
+    parser.add_argument('--label_clearance', type=non_negative_float, default=1,help='Least distance between a height label and any other label or survey point (meters)')
+    parser.add_argument('--label_budget', type=non_negative_int, default=0,help='Most height labels in the drawing, the distances are widened to fit. 0 for no limit')
+    parser.add_argument('-t', '--tin', action='store_true', default=False,help='Contour the triangulated points directly instead of the interpolation grid')
+    parser.add_argument('--tile_size', type=non_negative_float, default=0,help='Interpolate and contour in tiles of this size (meters) over several processes, 0 to disable')
+    parser.add_argument('-j', '--jobs', type=positive_int, default=None,help='Number of worker processes for tiled mode (default: all cores)')
     parser.add_argument('--no-sections',action='store_true', default=False, help='Do not add sections to the output file')
-    parser.add_argument('--section_resolution', type=float, default=4,help='Distance between section lines (in meters). This will snap to the interpolation grid')
+    parser.add_argument('--section_resolution', type=positive_float, default=4,help='Distance between section lines (in meters). This will snap to the interpolation grid')
+    parser.add_argument('--section_layer', type=str, default='SECTION',help='Polylines on this layer of the input are section alignments, instead of the x and y sections')
+    parser.add_argument('--section_file', type=str, default=None,help='Also take section alignments from this file, one "name,x,y" vertex per line')
+    parser.add_argument('--chainage_step', type=positive_float, default=None,help='Distance between section samples along an alignment (meters, default: the resolution)')
+    parser.add_argument('--compare', type=str, default=None,help='Earlier survey of the same site (DXF or points file): print the cut and fill volumes since then and draw contours of the height difference')
+    parser.add_argument('--compare_zero', type=float, default=None,help='Level reading at the zero point of the --compare survey (default: same as -z)')
+    parser.add_argument('--compare_chunk_cells', type=positive_int, default=1<<20,help='Grid nodes interpolated at a time when comparing, bounds memory use on large grids')
+    parser.add_argument('--max_match_distance', type=positive_float, default=None,help='Ignore MTEXTs further than this from any POINT (meters)')
+    parser.add_argument('--cache_dir', type=str, default=None,help='Keep the triangulation in this directory and reuse it on later runs with the same points and grid (off by default, about 42 bytes per grid node)')
+    parser.add_argument('--no-cache',action='store_true', default=False, help='Do not read or write the triangulation cache, even with --cache_dir. The --incremental snapshots are kept regardless')
+    parser.add_argument('--incremental', action='store_true', default=False,help='Replace the contours, labels and sections of a previous run in the drawing, and only interpolate again where the points changed')
+    parser.add_argument('--stream_dxf', action='store_true', default=False,help='Read only the POINTs and MTEXTs and append the output to a copy of the input, without loading the whole drawing')
+    parser.add_argument('--overwrite', choices=['ask','always','never'], default='ask',help='What to do when an output file already exists')
+    parser.add_argument('--profile', action='store_true', default=False,help='Print wall time, cpu time and peak memory of every stage')
+    parser.add_argument('--profile_json', type=str, default=None,help='Also write the --profile report to this JSON file')
     parser.add_argument('-v', '--verbose', action='store_true', default=False,help='verbose')
     parser.add_argument('-3','--export_stl',action='store_true', default=False, help='Export stl file of the mesh')
-    args = parser.parse_args()
-    print('\n\n')
-    print('             ▄▄▌   ▄▄▄ .   ▌ ▐·  ▄▄▌   ▄▄▄ .  ▄▄▄    ')
-    print('             ██•   ▀▄.▀·  ▪█·█▌  ██•   ▀▄.▀·  ▀▄ █·  ')
-    print('             ██▪   ▐▀▀▪▄  ▐█▐█•  ██▪   ▐▀▀▪▄  ▐▀▀▄   ')
-    print('             ▐█▌▐▌ ▐█▄▄▌   ███   ▐█▌▐▌ ▐█▄▄▌  ▐█•█▌  ')
-    print('              .▀▀▀  ▀▀▀   . ▀    .▀▀▀   ▀▀▀   .▀  ▀  ')  
-    print('\n\n')               
-    print('[+] Converting points from \033[34m%s\033[0m to contours...'%args.input_file)
-
+    parser.add_argument('--export_tin_stl',action='store_true', default=False, help='Export stl file of the triangulated survey points, without the interpolation grid')
+    parser.add_argument('--export_grid', action='store_true', default=False,help='Save the interpolated grid as a float32 .npy raster with a .json sidecar, see raster.load_grid')
+    parser.add_argument('--export_mesh', choices=['ply','obj'], default=None,help='Export the mesh with shared vertices as binary PLY or OBJ, much smaller than stl')
+    parser.add_argument('--stl_chunk_rows', type=positive_int, default=256,help='Grid rows written per band when exporting stl, bounds memory use on large grids')
+    return parser
+
+def confirm_overwrite(filename,policy):
+    # Decide up front whether an existing output file may be replaced
+    if(not os.path.isfile(filename) or policy=='always'):
+        return True
+    if(policy=='never'):
+        return False
+    response = input("[?] %s already exists, do you want to overwrite? (y/n): "%filename)
+    return response == "y"
+
+def output_filenames(args,filename_no_ext):
+    # Every file the options ask to write, by kind, the DXF first
+    base=args.output_file if args.output_file else filename_no_ext
+    files={}
+    if(not args.csv_only):
+        files['dxf']=args.output_file+'.dxf' if args.output_file else filename_no_ext+'_with_contours.dxf'
+    if(args.export_csv or args.csv_only):
+        files['csv']=filename_no_ext+'.csv'
+    if(args.csv_only):
+        return files
+    if(args.export_stl):
+        files['stl']=base+'.stl'
+    if(args.export_tin_stl):
+        files['tin_stl']=base+'_tin.stl'
+    if(args.export_mesh):
+        files['mesh']=base+'.'+args.export_mesh
+    if(args.export_grid):
+        files['grid']=base+'_grid.npy'
+    return files
+
+def confirm_outputs(args,files):
+    # Ask about all the existing output files before any work is done,
+    # drops the ones not to replace. None if the DXF is not to be replaced.
+    for kind,filename in list(files.items()):
+        if(kind=='csv' and os.path.abspath(filename)==os.path.abspath(args.input_file)):
+            print('[-] Not writing the csv over the input file %s'%filename)
+            del files[kind]
+        elif(not confirm_overwrite(filename,args.overwrite)):
+            if(kind=='dxf'):
+                print('[-] Not overwriting %s and exiting.'%filename)
+                return None
+            print('[-] Not overwriting %s, skipping it.'%filename)
+            del files[kind]
+    return files
+
+def show_surface(x,y,z,X,Y,Z,contour_levels):
+    # Plot the original data and the interpolated surface
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d import Axes3D
+    fig = plt.figure()
+    ax = fig.add_subplot(111, projection='3d')
+    ax.scatter(x, y, z, c='r', marker='o')
+    ax.plot_surface(X, Y, Z, cmap='viridis')
+    cset = ax.contour(X, Y, Z, zdir='z', offset=-5, cmap='coolwarm',levels=contour_levels)
+    plt.axis('equal')
+    plt.show()
+
+def run(args):
+    """
+    Convert one survey with the options parsed by build_parser().
+    Returns the name of the DXF written, or None if nothing was written.
+    """
+    global verbose
+    verbose=args.verbose
+    prof=profiler.Profiler(args.profile)
+    try:
+        return convert_survey(args,prof)
+    finally:
+        prof.report(args.profile_json,args.input_file)
+
+def read_dxf_survey(args,prof):
+    """
+    Read the POINTs and level reading MTEXTs of the input DXF and match
+    them. Returns (doc, combined x,y,z array, section alignments).
+    """
     # ============================= Interpret DXF ======================================
     # Load the DXF file
-    filename_no_ext=os.path.splitext(os.path.basename(args.input_file))[0]
-    doc = ezdxf.readfile(args.input_file)
+    prof.stage('dxf parsing')
+    if(args.stream_dxf):
+        # Only build the POINTs and MTEXTs, the output goes into a scratch document
+        # that is spliced into a copy of the input when saving
+        import dxf_stream
+        coordinates,texts,alignments = dxf_stream.read_survey(args.input_file,args.section_layer,skip_layers=GENERATED_LAYERS)
+        doc = dxf_stream.new_overlay(args.input_file)
+    else:
+        doc = ezdxf.readfile(args.input_file)
+        # Get the points from the DXF file
+        points = doc.modelspace().query('POINT')
+        # Extract the coordinates from the points
+        coordinates = [(point.dxf.location.x, point.dxf.location.y) for point in points]
+        # Get the texts from the DXF file, leaving out the labels of a previous run
+        texts = [(mtext.dxf.insert.x, mtext.dxf.insert.y, mtext.plain_text()) for mtext in doc.modelspace().query('MTEXT')
+                 if mtext.dxf.layer.upper() not in GENERATED_LAYERS]
+        # Section alignments drawn in the input
+        alignments = sections.read_alignments(doc.modelspace(),args.section_layer)
     print_if_verbose('[+] \033[34m%s\033[0m loaded!'%args.input_file)
-    msp = doc.modelspace()
-    # Get the points from the DXF file
-    points = msp.query('POINT')
-    # Extract the coordinates from the points
-    coordinates = [(point.dxf.location.x, point.dxf.location.y) for point in points]
-    # Get the texts from the DXF file
-    mtexts = msp.query('MTEXT')
     # zero point of level measurements
     offset=args.zero
     print_if_verbose('[i] Level reading at zero: %.2f'%offset)
     # Extract the position and text content from the MText entities
     mtext_list = []
-    for mtext in mtexts:
+    for text_x,text_y,text in texts:
         try:
-            z_value=float(mtext.plain_text().split('\n')[0])
-            mtext_list.append([mtext.dxf.insert.x, mtext.dxf.insert.y, z_value])
+            z_value=float(text.split('\n')[0])
+            mtext_list.append([text_x, text_y, z_value])
         except:
             #ignore values that cannot be converted to float
-            print_if_verbose('[!] Skipping MTEXT: %s'%repr(mtext.plain_text()))
+            print_if_verbose('[!] Skipping MTEXT: %s'%repr(text))
 
     # Combine points and text into x,y,z list
-    combined=[]
-    for label in mtext_list:
-        mind=float('inf')
-        nearpoint=[0,0]
-        for point in coordinates:
-            if(euclidean_distance(point,label[0:2])<mind):
-                nearpoint=point
-                mind=euclidean_distance(point,label[0:2])
-        if(args.pre_calculated_z):
-            combined.append([nearpoint[0],nearpoint[1],label[2]-offset])
-        else:
-            combined.append([nearpoint[0],nearpoint[1],offset-label[2]])
+    prof.stage('label matching')
+    coordinates=np.array(coordinates,dtype=float).reshape(-1,2)
+    mtext_list=np.array(mtext_list,dtype=float).reshape(-1,3)
+    label_index,point_index,contested,orphan_labels,orphan_points=match_labels_to_points(
+        coordinates,mtext_list[:,0:2],max_distance=args.max_match_distance)
+    if(len(contested)>0):
+        print('[!] %d POINTs are nearest to more than one MTEXT, the closest MTEXT keeps the POINT'%len(contested))
+        for i in contested:
+            print_if_verbose('[!] Contested POINT at %.3f,%.3f'%tuple(coordinates[i]))
+    if(len(orphan_labels)>0):
+        print('[!] %d MTEXTs could not be matched to a POINT'%len(orphan_labels))
+        for i in orphan_labels:
+            print_if_verbose('[!] Orphaned MTEXT %.3f at %.3f,%.3f'%(mtext_list[i,2],mtext_list[i,0],mtext_list[i,1]))
+    if(len(orphan_points)>0):
+        print('[!] %d POINTs have no MTEXT and were ignored'%len(orphan_points))
+        for i in orphan_points:
+            print_if_verbose('[!] Orphaned POINT at %.3f,%.3f'%tuple(coordinates[i]))
+    combined=np.empty((len(label_index),3))
+    combined[:,0:2]=coordinates[point_index]
+    if(args.pre_calculated_z):
+        combined[:,2]=mtext_list[label_index,2]-offset
+    else:
+        combined[:,2]=offset-mtext_list[label_index,2]
+    return doc,combined,alignments
+
+def convert_survey(args,prof):
+    print('[+] Converting points from \033[34m%s\033[0m to contours...'%args.input_file)
+    if(args.incremental and args.stream_dxf):
+        print('[-] --incremental has to edit the drawing, it cannot be used with --stream_dxf')
+        return None
+
+    filename_no_ext=os.path.splitext(os.path.basename(args.input_file))[0]
+    # Every overwrite question is asked here, not once the outputs are being written
+    output_files=confirm_outputs(args,output_filenames(args,filename_no_ext))
+    if(output_files is None):
+        return None
+    tabular=point_io.is_point_file(args.input_file)
+    if(tabular):
+        # ============================= Read points ======================================
+        # The file already has heights, no MTEXTs to match
+        prof.stage('point reading')
+        combined=point_io.read_points(args.input_file)
+        print_if_verbose('[+] \033[34m%s\033[0m loaded!'%args.input_file)
+        # There is no drawing to add to, start one with the survey points
+        doc=ezdxf.new('R2004')
+        for point in combined:
+            doc.modelspace().add_point((point[0],point[1]))
+        alignments=[]
+    else:
+        doc,combined,alignments=read_dxf_survey(args,prof)
+    msp = doc.modelspace()
+    if(args.incremental):
+        # Take out the contours, labels and sections of the previous run
+        print_if_verbose('[i] Removed %d entities of a previous run'%incremental.remove_generated(msp,GENERATED_LAYERS))
+    prof.count('points',len(combined))
     print_if_verbose('[i] Converted point list:')
     print_if_verbose(combined)
 
     # ============================= Export CSV ======================================
-    # Export to csv
-    if(args.export_csv or args.csv_only):
-        import csv
-        csv_filename=filename_no_ext+'.csv'
-        with open(csv_filename, 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(combined)
-            print('[+] CSV file written to %s'%csv_filename)
+    # Only the csv is wanted, the other outputs are written together at the end
     if(args.csv_only):
-        exit(0)
+        if('csv' in output_files):
+            prof.stage('csv export')
+            point_io.write_csv(output_files['csv'],combined)
+            print('[+] CSV file written to %s'%output_files['csv'])
+        return None
 
     # ============================= Contours ======================================
     # Generate data for matplotlib
-    x = np.array([x[0] for x in combined])
-    y = np.array([x[1] for x in combined])
-    z = np.array([x[2] for x in combined])
+    x = combined[:,0]
+    y = combined[:,1]
+    z = combined[:,2]
 
     # Calculate limits
+    prof.stage('interpolation')
     print_if_verbose("Resolution is "+str(args.resolution))
     min_x=my_floor(min(x),args.resolution)
     max_x=my_ceil(max(x),args.resolution)
@@ -139,197 +491,237 @@ plot such that the sections you want are in the x and y directions.
     print_if_verbose("x,y to x,y:"+str(min_x)+" "+str(min_y)+" "+str(max_x)+ " " + str(max_y))
     
     # Define a grid of points to interpolate over
-    x_subdivisions=((max_x-min_x+args.resolution)/args.resolution).astype(np.int64)
-    y_subdivisions=((max_y-min_y+args.resolution)/args.resolution).astype(np.int64)
-    print_if_verbose("Subdivisions in x:"+str(x_subdivisions))
-    print_if_verbose("Subdivisions in y:"+str(y_subdivisions))
-    x_new = np.linspace(min_x, max_x, x_subdivisions)
-    y_new = np.linspace(min_y, max_y, y_subdivisions)
-    X, Y = np.meshgrid(x_new, y_new)
+    x_new,y_new=grid_axes(min_x,max_x,min_y,max_y,args.resolution)
+    print_if_verbose("Subdivisions in x:"+str(len(x_new)))
+    print_if_verbose("Subdivisions in y:"+str(len(y_new)))
 
-    # Perform the interpolation
-    Z = griddata((x, y), z, (X, Y), method='linear')
-
-    # Generate contour lines
+    # The TIN contours and sections do not need the grid, only stl and the 3d view do
+    need_grid=(not args.tin) or args.export_stl or args.export_mesh or args.export_grid or args.show_3d
     contour_levels = np.arange(min_z,max_z,args.contour_z_distance)
     print_if_verbose('[i] Generated '+str(len(contour_levels))+'contour lines:'+str(contour_levels))
-    contour_set = plt.contour(X, Y, Z, levels=contour_levels)
+    contours=None
+    triangles=None
+    snapshot=None
+    if(args.incremental and need_grid):
+        snapshot_filename=incremental.snapshot_path(args.cache_dir or incremental.SNAPSHOT_DIR,args.input_file,args.resolution)
+        snapshot=incremental.load_snapshot(snapshot_filename)
+        if(snapshot is not None and not (np.array_equal(snapshot['x_new'],x_new) and np.array_equal(snapshot['y_new'],y_new))):
+            print('[i] The grid extents changed since the last run, interpolating everything again')
+            snapshot=None
+    if(snapshot is not None):
+        # Only interpolate again where the triangulation changed since the last run
+        tri=triangulation.build_delaunay(x,y)
+        triangles=tri.simplices
+        Z=snapshot['Z']
+        print('[i] %d points changed since the last run'%incremental.changed_points(snapshot['points'],combined))
+        window=incremental.changed_window(snapshot['points'],snapshot['triangles'],combined,triangles,x_new,y_new)
+        if(window is not None):
+            i0,i1,j0,j1=window
+            print('[i] Interpolating the grid again between %.2f,%.2f and %.2f,%.2f (%.1f%% of the grid)'%(
+                x_new[i0],y_new[j0],x_new[i1],y_new[j1],100*(i1-i0+1)*(j1-j0+1)/Z.size))
+            incremental.update_window(Z,x,y,z,x_new,y_new,window,tri)
+        X, Y = np.meshgrid(x_new, y_new)
+    elif(args.tile_size>0 and (need_grid or not args.tin)):
+        # Interpolate and contour the grid tile by tile over a process pool,
+        # with -t and no grid wanted there is nothing for the tiles to do
+        import tiles
+        print_if_verbose('[i] Interpolating in %.1fm tiles'%args.tile_size)
+        Z,contours=tiles.tiled_interpolation(x,y,z,x_new,y_new,contour_levels,args.tile_size,args.resolution,
+                                             want_contours=not args.tin,want_grid=need_grid,jobs=args.jobs)
+        if(need_grid):
+            X, Y = np.meshgrid(x_new, y_new)
+    elif(need_grid):
+        X, Y = np.meshgrid(x_new, y_new)
+
+        # Perform the interpolation, reusing the triangulation of a previous run on the same points and grid
+        weights,cache_hit=triangulation.load_or_build_weights(x,y,x_new,y_new,None if args.no_cache else args.cache_dir)
+        if(cache_hit):
+            print_if_verbose('[i] Reusing cached triangulation from %s'%args.cache_dir)
+        Z = triangulation.interpolate(z,weights,X.shape)
+        triangles=weights['simplices']
+    if(need_grid):
+        prof.count('grid cells',Z.size)
+    if(args.incremental and need_grid):
+        if(triangles is None):
+            triangles=triangulation.build_triangles(x,y)
+        incremental.save_snapshot(snapshot_filename,combined,triangles,x_new,y_new,Z)
+
+    # Generate contour lines
+    prof.stage('contouring')
+    if(args.tin):
+        if(triangles is None):
+            triangles=triangulation.build_triangles(x,y)
+        contours=contouring.tin_contours(x,y,z,triangles,contour_levels)
+    elif(contours is None):
+        contours=contouring.grid_contours(x_new,y_new,Z,contour_levels)
+
+    n_vertices=sum(len(vertices) for level,segments in contours for vertices in segments)
+    prof.count('contour vertices',n_vertices)
+
+    # Drop nearly collinear vertices
+    if(args.simplify>0):
+        prof.stage('simplify')
+        contours=contouring.simplify_contours(contours,args.simplify)
+        n_simplified=sum(len(vertices) for level,segments in contours for vertices in segments)
+        print('[i] Simplified contours from %d to %d vertices (%.1f%% fewer)'%(n_vertices,n_simplified,100*(1-n_simplified/max(n_vertices,1))))
+        prof.count('simplified vertices',n_simplified)
 
     # Add contours to the file
+    prof.stage('contour labels')
+    entities_before=len(msp)
+    # Height labels on the straight stretches, clear of each other and of the survey points
+    placed=contouring.place_labels(contours,args.label_spacing,args.label_clearance,args.label_budget,obstacles=combined[:,0:2])
+    n_labels=sum(len(positions) for level,positions in placed)
+    print_if_verbose('[i] Placed %d contour labels'%n_labels)
+    prof.count('contour labels',n_labels)
     color_index=10
-    for i,contourr in enumerate(contour_set.collections):
-        if(len(contourr.get_paths())==0):
+    for (level,segments),(_,positions) in zip(contours,placed):
+        if(len(segments)==0):
             continue
 
-        for point_set in contourr.get_paths():
+        for vertices in segments:
             # Create contour pline
-            pline = msp.add_polyline2d(point_set.vertices)
-            pline.update_dxf_attribs({'color':color_index})
-
-            # Add z height label to the polyline every (resolution*200 ish) points
-            for count,coords in enumerate(point_set.vertices):
-                if(count%(np.floor(args.resolution*200).astype(np.int64))==0):
-                    text = '%.2f'%contour_set.levels[i]
-                    mtext = msp.add_mtext(text, dxfattribs={
-                        'char_height': 0.3,
-                        'color': color_index,
-                        'layer': 'CONTOURHEIGHTS'
-                    })
-                    mtext.set_location(tuple(coords))
+            add_pline(msp,vertices,{'color':color_index,'layer':CONTOUR_LAYER})
 
-        color_index=(color_index+10)%255
-        # Add labels with the actual 'sealevel' height 
-        for point in combined:
-            text = '%.2f'%point[2]
-            mtext = msp.add_mtext(text, dxfattribs={
+        text = '%.2f'%level
+        for coords in positions:
+            msp.add_mtext(text, dxfattribs={
                 'char_height': 0.3,
-                'layer': 'POINTHEIGHTS'
+                'color': color_index,
+                'layer': CONTOUR_LABEL_LAYER,
+                'insert': (coords[0],coords[1])
             })
-            mtext.set_location((point[0]+0.2,point[1]-0.2))
-
-    # ========================= Sections ==============================
-
-    # Set section distance to match the gridlines
-    section_dist=my_floor(args.section_resolution,args.resolution)
-    # Make list of where sections will be drawn
-    sections_x=list(range(min_x,max_x+section_dist,section_dist))
-    print_if_verbose("[i] Making sections at x coordinate: "+str(sections_x))
-    sections_y=list(range(min_y,max_y+section_dist,section_dist))
-    print_if_verbose("[i] Making sections at y coordinate: "+str(sections_y))
-    # Find index of points at each x and y coordinate from above
-    def generate_section_indices(meshgrid_axis,values):
-        sections_indices=[]
-        ind=0
-        for i,s in enumerate(meshgrid_axis[0]):
-            if(s==values[ind]):
-                sections_indices.append(i)
-                ind+=1
-        return sections_indices
-    sections_x_indices=generate_section_indices(X,sections_x)
-    sections_y_indices=generate_section_indices(Y.T,sections_y)# use transpose of Y s.t. we can enumerate over the first element normally
-    print_if_verbose("[i] X section indices:"+str(sections_x_indices))
-    print_if_verbose("[i] Y section indices:"+str(sections_y_indices))
-
-    # TODO: make lists of x,y coordinates for each section
-    sections={}
-    def section_name(type,n):
-        if(type=='letter'):
-            if n <= 0:
-                ...
-                #throw exception
-
-            alphabet = "abcdefghijklmnopqrstuvwxyz"
-            result = ""
 
-            while n > 0:
-                remainder = (n - 1) % 26
-                result = alphabet[remainder] + result
-                n = (n - 1) // 26 
+        color_index=(color_index+10)%255
 
-            return result   
+    # Add labels with the actual 'sealevel' height, once for every point
+    for point in combined:
+        msp.add_mtext('%.2f'%point[2], dxfattribs={
+            'char_height': 0.3,
+            'layer': POINT_LABEL_LAYER,
+            'insert': (point[0]+0.2,point[1]-0.2)
+        })
+
+    # ========================= Cut and fill ==============================
+    if(args.compare):
+        prof.stage('volumes')
+        import volumes
+        # The earlier survey, only its points are needed
+        if(point_io.is_point_file(args.compare)):
+            before=point_io.read_points(args.compare)
         else:
-            return n
-    
-    # Vertical sections
-    section_num=1
-    for sex in sections_x_indices:
-        # make a list of coordinates from Z, on the index of y=sex
-        current_section=[]
-        for i in range(0,Y.shape[0]):
-            distance=Y[i,0]
-            height=Z[i,sex]
-            if not np.isnan(height):
-                current_section.append([distance,height])
-        sections[section_name('letter',section_num)]=current_section
-
-        # Add section icons to main drawing
-        anno_art1=msp.add_polyline2d([[X[0,sex],min_y],[X[0,sex],min_y-2],[X[0,sex]+0.5,min_y-2],[X[0,sex]+0.2,min_y-1.8]],dxfattribs={'color':2})
-        anno_art2=msp.add_polyline2d([[X[0,sex],max_y],[X[0,sex],max_y+2],[X[0,sex]+0.5,max_y+2],[X[0,sex]+0.2,max_y+1.8]],dxfattribs={'color':2})
-        anno_letter1=msp.add_mtext(section_name('letter',section_num), dxfattribs={'char_height': 0.3,'color': 2})
-        anno_letter1.set_location(tuple([X[0,sex],min_y]))
-        anno_letter2=msp.add_mtext(section_name('letter',section_num), dxfattribs={'char_height': 0.3,'color': 2})
-        anno_letter2.set_location(tuple([X[0,sex],max_y]))
-
-        section_num+=1
-        
-    # Horizontal sections
-    section_num=1 
-    for sey in sections_y_indices:
-        # make a list of coordinates from Z, on the index of x=sey
-        current_section=[]
-        for i in range(0,X.shape[1]):
-            distance=X[0,i]
-            height=Z[sey,i]
-            if not np.isnan(height):
-                current_section.append([distance,height])
-                sections[section_name('number',section_num)]=current_section
-
-        # Add section icons to main drawing
-        anno_art1=msp.add_polyline2d([[min_x,Y[sey,0]],[min_x-2,Y[sey,0]],[min_x-2,Y[sey,0]+0.5],[min_x-1.8,Y[sey,0]+0.2]],dxfattribs={'color':3})
-        anno_art1=msp.add_polyline2d([[max_x,Y[sey,0]],[max_x+2,Y[sey,0]],[max_x+2,Y[sey,0]+0.5],[max_x+1.8,Y[sey,0]+0.2]],dxfattribs={'color':3})
-        anno_letter1=msp.add_mtext(section_name('number',section_num), dxfattribs={'char_height': 0.3,'color': 2})
-        anno_letter1.set_location(tuple([min_x,Y[sey,0]]))
-        anno_letter2=msp.add_mtext(section_name('number',section_num), dxfattribs={'char_height': 0.3,'color': 2})
-        anno_letter2.set_location(tuple([max_x,Y[sey,0]]))
+            compare_args=argparse.Namespace(**vars(args))
+            compare_args.input_file=args.compare
+            compare_args.stream_dxf=True
+            if(args.compare_zero is not None):
+                compare_args.zero=args.compare_zero
+            before=read_dxf_survey(compare_args,profiler.Profiler(False))[1]
+
+        # Shared grid over both surveys
+        both=np.vstack((before[:,0:2],combined[:,0:2]))
+        compare_x,compare_y=grid_axes(my_floor(both[:,0].min(),args.resolution),my_ceil(both[:,0].max(),args.resolution),
+                                      my_floor(both[:,1].min(),args.resolution),my_ceil(both[:,1].max(),args.resolution),args.resolution)
+        result=volumes.compare_surfaces(before,combined,compare_x,compare_y,args.contour_z_distance,args.compare_chunk_cells)
+        print('[+] Compared with %s over %.1fm2: cut %.2fm3, fill %.2fm3, net %+.2fm3'%(
+            args.compare,result['area'],result['cut'],result['fill'],result['net']))
+
+        # Difference contours, red where material was cut, blue where filled
+        taken=np.vstack([combined[:,0:2]]+[positions for level,positions in placed])
+        diff_placed=contouring.place_labels(result['contours'],args.label_spacing,args.label_clearance,args.label_budget,obstacles=taken)
+        for (level,segments),(_,positions) in zip(result['contours'],diff_placed):
+            color_index=1 if level<0 else (5 if level>0 else 3)
+            for vertices in segments:
+                add_pline(msp,vertices,{'color':color_index,'layer':DIFF_CONTOUR_LAYER})
+            text='%+.2f'%level
+            for coords in positions:
+                msp.add_mtext(text, dxfattribs={
+                    'char_height': 0.3,
+                    'color': color_index,
+                    'layer': DIFF_LABEL_LAYER,
+                    'insert': (coords[0],coords[1])
+                })
 
-        section_num+=1
-
-    # Make pline with these lists at an empty space in the dxf
-    # This will be used to set the vertical spacing between sections
-    offset=-10
-    max_height_difference=np.nanmax(Z)-np.nanmin(Z)
-    print_if_verbose("[i] Max height difference in input"+str(max_height_difference))
-    for section in sections:
-        color_index=np.random.randint(1,255)
-        print_if_verbose("[i] Drawing section "+str(section)+"-"+str(section))
-        for point in sections[section]:
-            point[1]+=offset
-        sect_pline = msp.add_polyline2d(sections[section],dxfattribs={'color':color_index})
-
-        # ENHANCEMENT: add dashed line to show where nearest integer height to minimum point is (currently shows 0 point)
-        sect_reference=msp.add_polyline2d([[0,offset],[10,offset]],dxfattribs={'color':color_index})
-        sect_ref_mtext = msp.add_mtext("%%p0.00", dxfattribs={'char_height': 0.3,'color': color_index})
-        sect_ref_mtext.set_location(tuple([0,offset]))
-
-        # ENHANCEMENT: center text under section with its name
-        sect_name_mtext=msp.add_mtext("Section "+str(section), dxfattribs={'char_height': 0.3,'color': color_index})
-        sect_name_mtext.set_location(tuple([5,offset-1]))
-
-        # Draw the next line more down
-        offset-=5+max_height_difference
-
-    # Save the DXF file
-    output_filename=filename_no_ext+'_with_contours.dxf'
-    if(args.output_file):
-        output_filename=args.output_file+'.dxf'
-    if(os.path.isfile(output_filename)):
-        response = input("[?] DXF File already exists, do you want to overwrite? (y/n): ")
-        if response != "y":
-            print('[-] Not overwriting the file and exiting.')
-            exit(0)
-    doc.saveas(output_filename)
+    # ========================= Sections ==============================
+    if(not args.no_sections):
+        prof.stage('sections')
+        # Sample the same surface the contours were made from
+        if(args.tin):
+            sample=lambda px,py: sections.sample_tin(x,y,z,px,py)
+        else:
+            sample=lambda px,py: sections.sample_grid(x_new,y_new,Z,px,py)
+        step=args.chainage_step if args.chainage_step else args.resolution
+        height_range=np.ptp(z)
+        print_if_verbose('[i] %d section alignments on layer %s'%(len(alignments),args.section_layer))
+        if(args.section_file):
+            # These are not in the drawing yet, draw them with the sections
+            file_alignments=sections.read_alignment_file(args.section_file)
+            print_if_verbose('[i] %d section alignments in %s'%(len(file_alignments),args.section_file))
+            for name,vertices in file_alignments:
+                add_pline(msp,vertices,{'layer':SECTION_OUTPUT_LAYER})
+            alignments=alignments+file_alignments
+        if(len(alignments)>0):
+            add_alignment_sections(msp,alignments,sample,step,height_range)
+        else:
+            # Set section distance to match the gridlines
+            section_dist=my_floor(args.section_resolution,args.resolution)
+            add_grid_sections(msp,sample,min_x,max_x,min_y,max_y,section_dist,step,height_range)
+
+    prof.count('dxf entities emitted',len(msp)-entities_before)
+
+    # ============================= Outputs ======================================
+    # The outputs are written at the same time, they all only read the drawing and the surface
+    prof.stage('outputs')
+    writers=[]
+    output_filename=output_files['dxf']
+    if(args.stream_dxf and not tabular):
+        import dxf_stream
+        writers.append(('dxf save',lambda: dxf_stream.save_overlay(doc,args.input_file,output_filename)))
+    else:
+        writers.append(('dxf save',lambda: doc.saveas(output_filename)))
+    if('csv' in output_files):
+        writers.append(('csv export',lambda: point_io.write_csv(output_files['csv'],combined)))
+    if('stl' in output_files):
+        import surf2stl
+        writers.append(('stl export',lambda: surf2stl.write(output_files['stl'], x_new, y_new, Z, chunk_rows=args.stl_chunk_rows)))
+    if('tin_stl' in output_files):
+        import surf2stl
+        if(triangles is None):
+            triangles=triangulation.build_triangles(x,y)
+        writers.append(('tin stl export',lambda: surf2stl.tri_write(output_files['tin_stl'], x, y, z, triangles, skip_degenerate=True)))
+    if('mesh' in output_files):
+        import mesh_export
+        writers.append(('mesh export',lambda: mesh_export.write(output_files['mesh'], x_new, y_new, Z)))
+    if('grid' in output_files):
+        import raster
+        writers.append(('grid export',lambda: raster.save_grid(output_files['grid'], x_new, y_new, Z)))
+
+    # The 3d view stays on the main thread, the files are written while it is open
+    foreground=None
+    if(args.show_3d):
+        foreground=('3d view',lambda: show_surface(x,y,z,X,Y,Z,contour_levels))
+    times=outputs.write_all(writers,foreground)
+    # Every writer is a part of the outputs stage in the --profile report
+    for name,(wall,cpu) in times.items():
+        prof.substage(name,wall,cpu)
+        print_if_verbose('[i] %s took %.2fs'%(name,wall))
+
+    if('csv' in output_files):
+        print('[+] CSV file written to %s'%output_files['csv'])
+    if('grid' in output_files):
+        import raster
+        print('[+] Grid written to \033[34m%s\033[0m and \033[34m%s\033[0m'%raster.grid_filenames(output_files['grid']))
     print('[+] Saved output to \033[34m%s\033[0m'%output_filename)
     print('[+] Done!')
 
-    if(args.show_3d):
-        # Plot the original data and the interpolated surface
-        fig = plt.figure()
-        ax = fig.add_subplot(111, projection='3d')
-        ax.scatter(x, y, z, c='r', marker='o')
-        ax.plot_surface(X, Y, Z, cmap='viridis')
-        cset = ax.contour(X, Y, Z, zdir='z', offset=-5, cmap='coolwarm',levels=contour_levels)
-        plt.axis('equal')
-        plt.show()
-    
-    if (args.export_stl):
-        import surf2stl
-        
-        output_filename=filename_no_ext+'.stl'
-        if(args.output_file):
-            output_filename=args.output_file+'.stl'
-        if(os.path.isfile(output_filename)):
-            response = input("[?] STL File already exists, do you want to overwrite? (y/n): ")
-            if response != "y":
-                print('[-] Not overwriting the file and exiting.')
-                exit(0)
-        surf2stl.write(output_filename, X, Y, Z)
\ No newline at end of file
+    return output_filename
+
+if(__name__=="__main__"):
+    args = build_parser().parse_args()
+    print('\n\n')
+    print('             ▄▄▌   ▄▄▄ .   ▌ ▐·  ▄▄▌   ▄▄▄ .  ▄▄▄    ')
+    print('             ██•   ▀▄.▀·  ▪█·█▌  ██•   ▀▄.▀·  ▀▄ █·  ')
+    print('             ██▪   ▐▀▀▪▄  ▐█▐█•  ██▪   ▐▀▀▪▄  ▐▀▀▄   ')
+    print('             ▐█▌▐▌ ▐█▄▄▌   ███   ▐█▌▐▌ ▐█▄▄▌  ▐█•█▌  ')
+    print('              .▀▀▀  ▀▀▀   . ▀    .▀▀▀   ▀▀▀   .▀  ▀  ')  
+    print('\n\n')
+    run(args)
\ No newline at end of file
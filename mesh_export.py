@@ -0,0 +1,79 @@
+### mesh_export.py --- Indexed mesh export (PLY, OBJ) of the interpolated grid ---
+
+### Unlike STL, every valid grid node is written once and the triangles
+### refer to it by index, so a surface takes a fraction of the space. The
+### grid quads are split like surf2stl.write does and triangles touching a
+### NaN node are left out. Both formats are written with bulk NumPy writes.
+
+import os
+import numpy as np
+
+OBJ_CHUNK_ROWS = 1 << 16
+
+def grid_mesh(x, y, z):
+    """
+    Vertices and faces of the surface z over np.meshgrid(x, y), x and y
+    being the 1-dimensional grid axes. Returns ((n, 3) float vertices,
+    (m, 3) int32 faces indexing them), NaN nodes dropped.
+    """
+    valid = ~np.isnan(z)
+    rows, cols = np.nonzero(valid)
+    vertices = np.column_stack((x[cols], y[rows], z[rows, cols]))
+
+    # Vertex number of every grid node, -1 for NaN nodes
+    number = np.full(z.shape, -1, dtype=np.int64)
+    number[rows, cols] = np.arange(len(rows))
+    a = number[:-1, :-1]
+    b = number[:-1, 1:]
+    c = number[1:, 1:]
+    d = number[1:, :-1]
+    faces = np.stack((np.stack((a, b, c), axis=-1), np.stack((c, d, a), axis=-1)), axis=2).reshape(-1, 3)
+    faces = faces[(faces >= 0).all(axis=1)]
+    return vertices, faces.astype(np.int32)
+
+def write(filename, x, y, z):
+    """
+    Write the surface z over the grid axes x, y as an indexed mesh, binary
+    little endian PLY or OBJ depending on the extension of filename.
+    """
+    vertices, faces = grid_mesh(x, y, z)
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.ply':
+        write_ply(filename, vertices, faces)
+    elif extension == '.obj':
+        write_obj(filename, vertices, faces)
+    else:
+        raise ValueError('Unknown mesh format %s, use .ply or .obj' % extension)
+    print('Wrote %d vertices and %d faces' % (len(vertices), len(faces)))
+
+def write_ply(filename, vertices, faces):
+    """Binary little endian PLY with float vertices and int face indices."""
+    header = ('ply\n'
+              'format binary_little_endian 1.0\n'
+              'comment Created by levler\n'
+              'element vertex %d\n'
+              'property float x\n'
+              'property float y\n'
+              'property float z\n'
+              'element face %d\n'
+              'property list uchar int vertex_indices\n'
+              'end_header\n') % (len(vertices), len(faces))
+    records = np.empty(len(faces), dtype=[('count', 'u1'), ('indices', '<i4', (3,))])
+    records['count'] = 3
+    records['indices'] = faces
+    with open(filename, 'wb') as f:
+        f.write(header.encode('ascii'))
+        vertices.astype('<f4').tofile(f)
+        records.tofile(f)
+
+def write_obj(filename, vertices, faces):
+    """Wavefront OBJ with v and f lines, written in blocks of formatted rows."""
+    with open(filename, 'w') as f:
+        f.write('# Created by levler\n')
+        for i in range(0, len(vertices), OBJ_CHUNK_ROWS):
+            block = vertices[i:i+OBJ_CHUNK_ROWS]
+            f.write(('v %.6f %.6f %.6f\n' * len(block)) % tuple(block.ravel().tolist()))
+        for i in range(0, len(faces), OBJ_CHUNK_ROWS):
+            # OBJ indices start at 1
+            block = faces[i:i+OBJ_CHUNK_ROWS] + 1
+            f.write(('f %d %d %d\n' * len(block)) % tuple(block.ravel().tolist()))
@@ -0,0 +1,111 @@
+### outputs.py --- Writing the finished outputs side by side ---
+
+### Once the surface and the drawing are complete the output files do not
+### depend on each other, so they are all written at the same time and the
+### stage takes about as long as its slowest writer. On Linux every writer
+### gets its own forked process: the drawing and the arrays are inherited
+### copy on write and only read, so nothing is copied or pickled, and the
+### pure Python DXF save does not hold up the others on the GIL. Forking
+### after numpy and matplotlib are loaded is not safe on macOS and not
+### possible on Windows, there the writers run on threads, which still
+### overlap the NumPy and file writes as those release the GIL.
+
+import contextlib
+import io
+import multiprocessing
+import sys
+import time
+import traceback
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+def write_all(writers, foreground=None):
+    """
+    Run the writers, a list of (name, function) with functions taking no
+    arguments, all at the same time. foreground, a (name, function) pair,
+    runs in this process meanwhile (a matplotlib window has to be opened
+    from the main thread). What the writers print is printed once they have
+    all finished, in the order of the list.
+
+    Returns a dict of name: (wall seconds, cpu seconds) for the writers and
+    the foreground. If a writer failed, a RuntimeError with its traceback is
+    raised once all of them finished.
+    """
+    if sys.platform.startswith('linux'):
+        results, foreground_time = local_run_forked(writers, foreground)
+    else:
+        results, foreground_time = local_run_threaded(writers, foreground)
+
+    times = {}
+    failed = []
+    for (name, function), (ok, value, log) in zip(writers, results):
+        print(log, end='')
+        if ok:
+            times[name] = value
+        else:
+            failed.append('%s failed:\n%s' % (name, value))
+    if foreground is not None:
+        times[foreground[0]] = foreground_time
+    if failed:
+        raise RuntimeError('\n'.join(failed))
+    return times
+
+# Local subfunctions
+
+def local_run_forked(writers, foreground):
+    context = multiprocessing.get_context('fork')
+    jobs = []
+    for name, function in writers:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=local_child, args=(function, sender), daemon=True)
+        process.start()
+        sender.close()
+        jobs.append((process, receiver))
+    foreground_time = None
+    try:
+        if foreground is not None:
+            foreground_time = local_timed(foreground[1], False)[1]
+    finally:
+        results = []
+        for process, receiver in jobs:
+            try:
+                result = receiver.recv()
+            except EOFError:
+                result = (False, 'the writer process died without a result', '')
+            process.join()
+            if process.exitcode != 0 and result[0]:
+                result = (False, 'the writer process exited with code %d' % process.exitcode, result[2])
+            results.append(result)
+    return results, foreground_time
+
+def local_child(function, sender):
+    # --profile only traces the main process, tracing here would just slow the writer down
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    sender.send(local_timed(function))
+    sender.close()
+
+def local_run_threaded(writers, foreground):
+    foreground_time = None
+    if len(writers) == 0:
+        if foreground is not None:
+            foreground_time = local_timed(foreground[1], False)[1]
+        return [], foreground_time
+    with ThreadPoolExecutor(max_workers=len(writers)) as executor:
+        # Threads share sys.stdout, their output is not captured separately
+        futures = [executor.submit(local_timed, function, False) for name, function in writers]
+        if foreground is not None:
+            foreground_time = local_timed(foreground[1], False)[1]
+    return [future.result() for future in futures], foreground_time
+
+def local_timed(function, capture=True):
+    # (ok, (wall, cpu) seconds or traceback, printed text), cpu of this thread only
+    log = io.StringIO()
+    start = time.perf_counter()
+    cpu = time.thread_time()
+    try:
+        with (contextlib.redirect_stdout(log) if capture else contextlib.nullcontext()):
+            function()
+    except Exception:
+        return False, traceback.format_exc(), log.getvalue()
+    return True, (time.perf_counter() - start, time.thread_time() - cpu), log.getvalue()
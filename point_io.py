@@ -0,0 +1,63 @@
+### point_io.py --- Tabular x, y, z point input and output ---
+
+### Surveys that already have heights (total station exports, or the csv
+### written by --export_csv) can be read directly instead of matching
+### POINTs and MTEXTs in a DXF. Every reader and writer here works on the
+### whole (n, 3) array at once.
+
+import os
+import numpy as np
+
+# Extension: column delimiter for np.loadtxt (None is any whitespace)
+TEXT_DELIMITERS = {
+    '.csv': ',',
+    '.xyz': None,
+    '.txt': None,
+}
+
+POINT_EXTENSIONS = tuple(TEXT_DELIMITERS) + ('.npy',)
+
+CSV_CHUNK_ROWS = 1 << 16
+
+def is_point_file(filename):
+    return os.path.splitext(filename)[1].lower() in POINT_EXTENSIONS
+
+def read_points(filename):
+    """
+    Read x, y, z points from a .csv, .xyz/.txt (whitespace separated) or
+    .npy file. Text files may have a header line, columns after the third
+    are ignored. Returns an (n, 3) float array.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.npy':
+        points = np.load(filename)
+        if points.ndim != 2 or points.shape[1] < 3:
+            raise ValueError('%s holds a %s array, expected (n, 3) x, y, z points' % (filename, points.shape))
+        return np.ascontiguousarray(points[:, :3], dtype=float)
+
+    delimiter = TEXT_DELIMITERS[extension]
+    return np.loadtxt(filename, delimiter=delimiter, usecols=(0, 1, 2), ndmin=2,
+                      comments='#', skiprows=local_header_rows(filename, delimiter))
+
+def write_csv(filename, points):
+    """Write (n, 3) points as x,y,z csv lines, blocks of rows at a time."""
+    # Same text as csv.writer: shortest round trip floats and \r\n line ends
+    with open(filename, 'w', newline='') as f:
+        for i in range(0, len(points), CSV_CHUNK_ROWS):
+            block = points[i:i+CSV_CHUNK_ROWS]
+            f.write(('%r,%r,%r\r\n' * len(block)) % tuple(block.ravel().tolist()))
+
+# Local subfunctions
+
+def local_header_rows(filename, delimiter):
+    # Lines to skip up to a header, if the first data line does not start with a number
+    with open(filename) as f:
+        for i, line in enumerate(f):
+            if line.strip() == '' or line.lstrip().startswith('#'):
+                continue
+            try:
+                float(line.split(delimiter)[0])
+                return 0
+            except ValueError:
+                return i + 1
+    return 0
@@ -0,0 +1,109 @@
+### profiler.py --- Per-stage timing and memory report for --profile ---
+
+### Stages are marked sequentially: starting a stage ends the previous one.
+### For every stage the wall time, CPU time and peak traced memory
+### (tracemalloc, Python and NumPy allocations of this process) are kept,
+### along with free form counts such as points or entities emitted.
+### Parts of a stage that run at the same time (the output writers) are
+### recorded as sub-stages of it, listed under it and left out of the totals.
+
+import json
+import time
+import tracemalloc
+
+class Profiler:
+    """
+    Collects stage timings when enabled, does nothing otherwise so the
+    stage() and count() calls can stay in the pipeline unconditionally.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = []
+        self.counts = {}
+        self._current = None
+        self._parts = []
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        """End the running stage, if any, and start timing a new one."""
+        if not self.enabled:
+            return
+        self._end()
+        tracemalloc.reset_peak()
+        self._current = (name, time.perf_counter(), time.process_time())
+
+    def substage(self, name, wall, cpu):
+        """
+        Record part of the running stage timed on its own, e.g. one of the
+        outputs written at the same time. Its peak memory is not known.
+        """
+        if not self.enabled or self._current is None:
+            return
+        self._parts.append({
+            'stage': name,
+            'wall': wall,
+            'cpu': cpu,
+            'peak_memory': None,
+            'within': self._current[0],
+        })
+
+    def count(self, name, value):
+        """Record a count, adding to it if it was already recorded."""
+        if not self.enabled:
+            return
+        self.counts[name] = self.counts.get(name, 0) + int(value)
+
+    def finish(self):
+        """End the running stage and stop tracing memory."""
+        if not self.enabled:
+            return
+        self._end()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self, json_filename=None, label=''):
+        """Print the stage table and optionally write it as JSON."""
+        if not self.enabled:
+            return
+        self.finish()
+        print('[i] Profile %s' % label)
+        print('    %-20s %10s %10s %14s' % ('stage', 'wall (s)', 'cpu (s)', 'peak mem (MB)'))
+        for s in self.stages:
+            if 'within' in s:
+                print('      %-18s %10.3f %10.3f %14s' % (s['stage'], s['wall'], s['cpu'], '-'))
+            else:
+                print('    %-20s %10.3f %10.3f %14.1f' % (s['stage'], s['wall'], s['cpu'], s['peak_memory'] / 2**20))
+        print('    %-20s %10.3f %10.3f %14.1f' % ('total', self.total('wall'), self.total('cpu'),
+                                                max([s['peak_memory'] for s in self.stages if 'within' not in s] + [0]) / 2**20))
+        for name, value in self.counts.items():
+            print('    %-20s %10d' % (name, value))
+        if json_filename:
+            with open(json_filename, 'w') as f:
+                json.dump({
+                    'label': label,
+                    'stages': self.stages,
+                    'counts': self.counts,
+                    'total_wall': self.total('wall'),
+                    'total_cpu': self.total('cpu'),
+                }, f, indent=2)
+            print('[+] Profile written to \033[34m%s\033[0m' % json_filename)
+
+    def total(self, key):
+        # Sub-stages are already counted in their stage
+        return sum(s[key] for s in self.stages if 'within' not in s)
+
+    def _end(self):
+        if self._current is None:
+            return
+        name, wall, cpu = self._current
+        self.stages.append({
+            'stage': name,
+            'wall': time.perf_counter() - wall,
+            'cpu': time.process_time() - cpu,
+            'peak_memory': tracemalloc.get_traced_memory()[1],
+        })
+        self.stages.extend(self._parts)
+        self._parts = []
+        self._current = None
@@ -0,0 +1,73 @@
+### raster.py --- Height grid export as a memory mappable raster ---
+
+### The interpolated grid is kept as a float32 .npy file, one row per grid
+### row from the lowest y up, with a JSON sidecar holding the origin (the
+### x, y of the first node), the cell size and NaN as the nodata value.
+### load_grid memory maps the .npy, so downstream tools can read windows of
+### a grid much larger than the RAM.
+
+import json
+import os
+import numpy as np
+
+FORMAT_NAME = 'levler-grid'
+FORMAT_VERSION = 1
+WRITE_CHUNK_ROWS = 1024
+
+def grid_filenames(filename):
+    """The (.npy, .json) pair of file names for a grid named filename."""
+    base = os.path.splitext(filename)[0]
+    return base + '.npy', base + '.json'
+
+def save_grid(filename, x, y, Z):
+    """
+    Write Z, the heights over np.meshgrid(x, y) with x, y the evenly spaced
+    grid axes, as float32 <filename>.npy plus a <filename>.json sidecar.
+    Returns the two file names.
+    """
+    npy_filename, json_filename = grid_filenames(filename)
+    # Convert to float32 band by band straight into the file, without a full size copy
+    data = np.lib.format.open_memmap(npy_filename, mode='w+', dtype='<f4', shape=Z.shape)
+    for i in range(0, Z.shape[0], WRITE_CHUNK_ROWS):
+        data[i:i+WRITE_CHUNK_ROWS] = Z[i:i+WRITE_CHUNK_ROWS]
+    data.flush()
+    del data
+
+    with open(json_filename, 'w') as f:
+        json.dump({
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'data': os.path.basename(npy_filename),
+            'dtype': 'float32',
+            'shape': list(Z.shape),
+            'origin': [float(x[0]), float(y[0])],
+            'cell_size': [local_step(x), local_step(y)],
+            'nodata': 'NaN',
+            'row_order': 'increasing y',
+        }, f, indent=2)
+    return npy_filename, json_filename
+
+def load_grid(filename, mmap_mode='r'):
+    """
+    Open a grid written by save_grid, given either of its two files.
+    Returns (x, y, Z) like the pipeline holds them, Z being a read only
+    memory map of the .npy unless mmap_mode is None.
+    """
+    json_filename = grid_filenames(filename)[1]
+    with open(json_filename) as f:
+        info = json.load(f)
+    if info.get('format') != FORMAT_NAME:
+        raise ValueError('%s is not a %s sidecar' % (json_filename, FORMAT_NAME))
+    npy_filename = os.path.join(os.path.dirname(json_filename), info['data'])
+    Z = np.load(npy_filename, mmap_mode=mmap_mode)
+    if list(Z.shape) != info['shape']:
+        raise ValueError('%s has shape %s, the sidecar says %s' % (npy_filename, Z.shape, info['shape']))
+    rows, cols = Z.shape
+    x = info['origin'][0] + info['cell_size'][0] * np.arange(cols)
+    y = info['origin'][1] + info['cell_size'][1] * np.arange(rows)
+    return x, y, Z
+
+# Local subfunctions
+
+def local_step(axis):
+    return float((axis[-1] - axis[0]) / (len(axis) - 1)) if len(axis) > 1 else 0.0
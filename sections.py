@@ -0,0 +1,117 @@
+### sections.py --- Section profiles along arbitrary alignments ---
+
+### An alignment is a polyline on the plan (a road or pipe centerline, or
+### the straight grid sections). It is sampled every chainage step, plus at
+### each of its vertices so bends are not cut, and the surface height is
+### read at all the sample points of all alignments at once: bilinear on
+### the interpolation grid, or barycentric on the TIN.
+
+import csv
+import numpy as np
+import triangulation
+
+ALIGNMENT_TYPES = ('LWPOLYLINE', 'POLYLINE', 'LINE')
+
+def alignment_vertices(entity):
+    """
+    Plan vertices of a LWPOLYLINE, POLYLINE or LINE entity as an (n, 2)
+    array, closed polylines ending back at their first vertex.
+    """
+    kind = entity.dxftype()
+    if kind == 'LINE':
+        vertices = [entity.dxf.start, entity.dxf.end]
+    elif kind == 'LWPOLYLINE':
+        vertices = list(entity.get_points('xy'))
+    else:
+        vertices = [vertex.dxf.location for vertex in entity.vertices]
+    vertices = np.array([(v[0], v[1]) for v in vertices], dtype=float).reshape(-1, 2)
+    if kind != 'LINE' and entity.is_closed and len(vertices) > 2:
+        vertices = np.vstack((vertices, vertices[:1]))
+    return vertices
+
+def read_alignments(entities, layer):
+    """
+    Alignments drawn on the given layer, as a list of (name, vertices)
+    named S1, S2... in drawing order.
+    """
+    alignments = []
+    for entity in entities:
+        if entity.dxftype() in ALIGNMENT_TYPES and entity.dxf.layer.upper() == layer.upper():
+            vertices = alignment_vertices(entity)
+            if len(vertices) > 1:
+                alignments.append(('S%d' % (len(alignments) + 1), vertices))
+    return alignments
+
+def read_alignment_file(filename):
+    """
+    Alignments from a text file with one "name,x,y" vertex per line (comma
+    or whitespace separated), the vertices of each name in order.
+    Returns a list of (name, vertices) in order of first appearance.
+    """
+    alignments = {}
+    with open(filename, newline='') as f:
+        for row in csv.reader(f):
+            fields = ' '.join(row).split()
+            if len(fields) == 0 or fields[0].startswith('#'):
+                continue
+            alignments.setdefault(fields[0], []).append((float(fields[1]), float(fields[2])))
+    return [(name, np.array(vertices)) for name, vertices in alignments.items() if len(vertices) > 1]
+
+def chainage_points(vertices, step):
+    """
+    Sample points along a polyline every step meters and at its vertices.
+    Returns (chainage, (n, 2) points).
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    lengths = np.hypot(*np.diff(vertices, axis=0).T)
+    # Repeated vertices would make the chainage go backwards in np.interp
+    vertices = vertices[np.concatenate(([True], lengths > 0))]
+    at_vertex = np.concatenate(([0.0], np.cumsum(lengths[lengths > 0])))
+    chainage = np.union1d(np.arange(0, at_vertex[-1], step), at_vertex)
+    points = np.column_stack((np.interp(chainage, at_vertex, vertices[:, 0]),
+                              np.interp(chainage, at_vertex, vertices[:, 1])))
+    return chainage, points
+
+def sample_grid(x_new, y_new, Z, px, py):
+    """
+    Bilinear interpolation of the grid Z over np.meshgrid(x_new, y_new) at
+    the points (px, py). NaN outside the grid or next to a NaN node.
+    """
+    fx = (px - x_new[0]) / ((x_new[-1] - x_new[0]) / (len(x_new) - 1))
+    fy = (py - y_new[0]) / ((y_new[-1] - y_new[0]) / (len(y_new) - 1))
+    i = np.clip(np.floor(fx).astype(np.int64), 0, len(x_new) - 2)
+    j = np.clip(np.floor(fy).astype(np.int64), 0, len(y_new) - 2)
+    tx = fx - i
+    ty = fy - j
+
+    values = np.stack((Z[j, i], Z[j, i + 1], Z[j + 1, i], Z[j + 1, i + 1]))
+    weights = np.stack(((1 - tx) * (1 - ty), tx * (1 - ty), (1 - tx) * ty, tx * ty))
+    # Nodes with no weight do not count, so points on a grid line next to a NaN node keep their height
+    used = weights != 0
+    heights = np.where(used, values * weights, 0).sum(axis=0)
+    eps = 1e-9
+    outside = (fx < -eps) | (fx > len(x_new) - 1 + eps) | (fy < -eps) | (fy > len(y_new) - 1 + eps)
+    heights[outside | (used & np.isnan(values)).any(axis=0)] = np.nan
+    return heights
+
+def sample_tin(x, y, z, px, py):
+    """
+    Linear interpolation on the triangulated points at (px, py), NaN
+    outside their convex hull.
+    """
+    weights = triangulation.point_weights(x, y, px, py)
+    return triangulation.interpolate(z, weights, np.shape(px))
+
+def sample_profiles(alignments, step, sample):
+    """
+    Profiles of the alignments every step meters. sample(px, py) gives the
+    surface heights and is called once for all the alignments together.
+    Returns a list of (name, chainage, heights).
+    """
+    if len(alignments) == 0:
+        return []
+    samples = [chainage_points(vertices, step) for name, vertices in alignments]
+    points = np.concatenate([p for chainage, p in samples])
+    heights = sample(points[:, 0], points[:, 1])
+    heights = np.split(heights, np.cumsum([len(chainage) for chainage, p in samples])[:-1])
+    return [(name, chainage, h) for (name, vertices), (chainage, p), h in zip(alignments, samples, heights)]
@@ -0,0 +1,144 @@
+###############################################################################
+##                                                                           ##
+##      Conversion server: keeps level_to_contour loaded between runs        ##
+##                                                                           ##
+###############################################################################
+
+# Usage:
+#   python server.py                      requests on stdin, one per line
+#   python server.py --socket /tmp/levler.sock
+#   python server.py --watch site.dxf [level_to_contour options]
+#
+# A request is a JSON list of level_to_contour arguments, or an object with
+# them under "args", e.g. ["site.dxf", "-d", "0.25"]. Every request gets one
+# JSON line back with the same fields as the batch.py summary. The heavy
+# modules are imported once, and triangulations and streamed surveys are
+# kept in memory between requests. Only requests with --stream_dxf reuse
+# the parsed survey: without it the whole drawing is read and then edited
+# in place, so it is read again for every request.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+import time
+
+# Conversions never open a window, make sure matplotlib does not try to
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+import batch
+import dxf_stream
+import level_to_contour
+import triangulation
+
+def preload():
+    # Pay for the imports the pipeline does lazily once, before the first request
+    import contourpy
+    import scipy.spatial
+    import ezdxf.addons.iterdxf
+    triangulation.MEMORY_CACHE_SIZE=4
+    dxf_stream.READ_CACHE_SIZE=4
+
+def parse_request(line):
+    # JSON list of arguments, or {"args": [...]}
+    request=json.loads(line)
+    return parse_arguments(request['args'] if isinstance(request,dict) else request)
+
+def parse_arguments(argv):
+    # level_to_contour arguments to its namespace, ValueError if they cannot be used here
+    parser=level_to_contour.build_parser(prog='server')
+    parser.set_defaults(overwrite='always')
+    message=io.StringIO()
+    try:
+        # -h prints to stdout, which is the reply stream in stdin mode
+        with contextlib.redirect_stderr(message),contextlib.redirect_stdout(message):
+            args=parser.parse_args([str(a) for a in argv])
+    except SystemExit as e:
+        text=message.getvalue().strip()
+        if(e.code==0):
+            # Help asked for, it is the reply
+            raise ValueError(text)
+        raise ValueError(text.splitlines()[-1] if text else 'invalid arguments')
+    if(args.show_3d):
+        raise ValueError('-s/--show_3d needs a window, it cannot be used by the server')
+    if(args.overwrite=='ask'):
+        raise ValueError('--overwrite ask would wait for input, use always or never')
+    return args
+
+def handle(line):
+    # One request line to one response line
+    try:
+        args=parse_request(line)
+    except Exception as e:
+        return json.dumps({'status':'failed','error':str(e)})
+    return json.dumps(batch.convert(args))
+
+def serve_stdin():
+    for line in sys.stdin:
+        if(line.strip()):
+            print(handle(line),flush=True)
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if(line.strip()):
+                self.wfile.write((handle(line.decode('utf-8'))+'\n').encode('utf-8'))
+                self.wfile.flush()
+
+def serve_socket(path):
+    if(os.path.exists(path)):
+        os.remove(path)
+    # Leave through the finally below on kill too, so the socket file is removed
+    signal.signal(signal.SIGTERM,lambda signum,frame: sys.exit(0))
+    with socketserver.UnixStreamServer(path,RequestHandler) as server:
+        print('[+] Listening on \033[34m%s\033[0m'%path,file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+def watch(files,options,interval):
+    # Convert a file again once it was saved and its mtime stayed the same for one interval
+    jobs={f:parse_arguments([f]+options) for f in files}
+    done={f:None for f in files}
+    seen={f:None for f in files}
+    print('[+] Watching %d files, Ctrl+C to stop'%len(files),file=sys.stderr)
+    while True:
+        for filename in files:
+            try:
+                mtime=os.stat(filename).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if(mtime!=done[filename] and mtime==seen[filename]):
+                result=batch.convert(jobs[filename])
+                print(json.dumps(result),flush=True)
+                # Converting in place changes the mtime, do not take that for a save
+                done[filename]=os.stat(filename).st_mtime_ns
+            seen[filename]=mtime
+        time.sleep(interval)
+
+if(__name__=="__main__"):
+    parser=argparse.ArgumentParser(prog='server',
+                    description='Keeps level_to_contour loaded and converts surveys on request, or whenever they are saved. '
+                                'Triangulations are reused between requests, parsed surveys only for requests with --stream_dxf.')
+    parser.add_argument('--socket', type=str, default=None,help='Take requests on this Unix socket instead of stdin')
+    parser.add_argument('--watch', type=str, nargs='+', default=None,help='Convert these DXF files every time they are saved, remaining arguments are level_to_contour options')
+    parser.add_argument('--interval', type=float, default=0.5,help='Seconds between checks of the watched files')
+    args,options=parser.parse_known_args()
+    preload()
+    try:
+        if(args.watch):
+            try:
+                watch(args.watch,options,args.interval)
+            except ValueError as e:
+                parser.error(str(e))
+        elif(args.socket):
+            serve_socket(args.socket)
+        else:
+            serve_stdin()
+    except KeyboardInterrupt:
+        pass
@@ -14,11 +14,26 @@
 
 import numpy as np
 import datetime
-import math
-from scipy.spatial import Delaunay 
 import struct
 
-def write(filename, x, y, z, mode='binary'):
+# One binary STL facet record: normal, three vertices and the attribute byte count (50 bytes)
+STL_FACET_DTYPE = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('v1', '<f4', (3,)),
+    ('v2', '<f4', (3,)),
+    ('v3', '<f4', (3,)),
+    ('attr', '<u2'),
+])
+
+ASCII_FACET_FORMAT = ('facet normal %.7f %.7f %.7f\n'
+                      'outer loop\n'
+                      'vertex %.7f %.7f %.7f\n'
+                      'vertex %.7f %.7f %.7f\n'
+                      'vertex %.7f %.7f %.7f\n'
+                      'endloop\n'
+                      'endfacet\n')
+
+def write(filename, x, y, z, mode='binary', chunk_rows=None):
     """
     Write a stl file for a surface with geometry
     defined from three matrix arguments, x, y, and z.
@@ -37,6 +52,11 @@ def write(filename, x, y, z, mode='binary'):
     mode : string
         STL file format, 'ascii' or 'binary'(default).
 
+    chunk_rows : int, optional
+        Stream the grid to the file in bands of this many rows of quads,
+        so memory use is bounded by the band size instead of the grid size.
+        By default the whole grid is written in one pass.
+
     Examples
     ----------
     import numpy as np
@@ -69,7 +89,9 @@ def write(filename, x, y, z, mode='binary'):
 
     if len(x.shape) == 1 and x.shape[0] == z.shape[1] \
             and len(y.shape) == 1 and y.shape[0] == z.shape[0]:
-        x, y = np.meshgrid(x, y)
+        # Broadcast views instead of np.meshgrid so no full-size x, y grids are allocated
+        x = np.broadcast_to(x, z.shape)
+        y = np.broadcast_to(y[:, np.newaxis], z.shape)
 
     if len(x.shape) != len(z.shape) \
             or len(y.shape) != len(z.shape) \
@@ -77,7 +99,6 @@ def write(filename, x, y, z, mode='binary'):
             or y.shape[0] != z.shape[0]:
         raise Exception('Unable to resolve x and y variables')
 
-    nfacets = 0
     title_str = 'Created by surf2stl.py %s' % datetime.datetime.now().strftime('%d-%b-%Y %H:%M:%S')
 
     f = open(filename, 'wb' if mode != 'ascii' else 'w')
@@ -88,34 +109,28 @@ def write(filename, x, y, z, mode='binary'):
         title_str_ljust = title_str.ljust(80)
         # f.write(title_str_ljust.encode('utf-8')) # same as 'ascii' for alphabet characters
         f.write(title_str_ljust.encode('ascii'))
-        f.write(struct.pack('i', 0))
-
-    for i in range(z.shape[0]-1):
-        for j in range(z.shape[1]-1):
-            p1 = np.array([x[i,j], y[i,j], z[i,j]])
-            p2 = np.array([x[i,j+1], y[i,j+1], z[i,j+1]])
-            p3 = np.array([x[i+1,j+1], y[i+1,j+1], z[i+1,j+1]])
-            val = local_write_facet(f, p1, p2, p3, mode)
-            nfacets += val
-
-            p1 = np.array([x[i+1,j+1], y[i+1,j+1], z[i+1,j+1]])
-            p2 = np.array([x[i+1,j], y[i+1,j], z[i+1,j]])
-            p3 = np.array([x[i,j], y[i,j], z[i,j]])
-            val = local_write_facet(f, p1, p2, p3, mode)
-            nfacets += val
+        f.write(struct.pack('<i', 0))
+
+    nfacets = 0
+    rows = z.shape[0] - 1
+    band = max(1, rows if chunk_rows is None else chunk_rows)
+    for i in range(0, rows, band):
+        # Bands share their boundary row so no quads are lost between them
+        p1, p2, p3 = local_grid_facets(x[i:i+band+1], y[i:i+band+1], z[i:i+band+1])
+        nfacets += local_write_facets(f, p1, p2, p3, mode)
 
     if mode == 'ascii':
         f.write('endsolid %s\n' % title_str)
     else:
         f.seek(80, 0)
-        f.write(struct.pack('i', nfacets))
+        f.write(struct.pack('<i', nfacets))
 
     f.close()
 
     print('Wrote %d facets' % nfacets)
     return
 
-def tri_write(filename, x, y, z, tri, mode='binary'):
+def tri_write(filename, x, y, z, tri, mode='binary', chunk_size=None, skip_degenerate=False):
     """
     Write a stl file for a surface with geometry
     defined from three matrix arguments, x, y, and z
@@ -133,14 +148,22 @@ def tri_write(filename, x, y, z, tri, mode='binary'):
     x, y, z : ndarray
         Each of these arguments must be 1-dimensional.
 
-    tri : scipy.spatial.Delaunay
-        Delaunay Triangulation object. 
+    tri : scipy.spatial.Delaunay or ndarray
+        Delaunay Triangulation object, or its (ntri, 3) simplices array.
         When xyz coordinates are determined from other parameters(like (u, v)),
         this triangle faces are basically calculated with the parameters.
         
     mode : string
         STL file format, 'ascii' or 'binary'(default).
 
+    chunk_size : int, optional
+        Stream the triangles to the file this many at a time.
+        By default all triangles are written in one pass.
+
+    skip_degenerate : bool
+        Leave out triangles with zero area, e.g. slivers between collinear
+        points or vertical faces of repeated x, y points.
+
     Examples
     ----------
     import numpy as np
@@ -176,7 +199,6 @@ def tri_write(filename, x, y, z, tri, mode='binary'):
             or y.shape[0] != z.shape[0]:
         raise Exception('Number of x,y,z elements must be equal')
 
-    nfacets = 0
     title_str = 'Created by surf2stl.py %s' % datetime.datetime.now().strftime('%d-%b-%Y %H:%M:%S')
 
     f = open(filename, 'wb' if mode != 'ascii' else 'w')
@@ -187,23 +209,21 @@ def tri_write(filename, x, y, z, tri, mode='binary'):
         title_str_ljust = title_str.ljust(80)
         # f.write(title_str_ljust.encode('utf-8')) # same as 'ascii' for alphabet characters
         f.write(title_str_ljust.encode('ascii'))
-        f.write(struct.pack('i', 0))
-
-    indices = tri.simplices
-    verts = tri.points[indices]
-    for i in range(0, indices.shape[0], 1):
-        p = indices[i]
-        p1 = np.array([x[p[0]], y[p[0]], z[p[0]]])
-        p2 = np.array([x[p[1]], y[p[1]], z[p[1]]])
-        p3 = np.array([x[p[2]], y[p[2]], z[p[2]]])
-        val = local_write_facet(f, p1, p2, p3, mode)
-        nfacets += val
+        f.write(struct.pack('<i', 0))
+
+    nfacets = 0
+    indices = tri.simplices if hasattr(tri, 'simplices') else np.asarray(tri)
+    vertices = np.column_stack((x, y, z))
+    band = max(1, indices.shape[0] if chunk_size is None else chunk_size)
+    for i in range(0, indices.shape[0], band):
+        p1, p2, p3 = local_tri_facets(vertices, indices[i:i+band])
+        nfacets += local_write_facets(f, p1, p2, p3, mode, skip_degenerate)
 
     if mode == 'ascii':
         f.write('endsolid %s\n' % title_str)
     else:
         f.seek(80, 0)
-        f.write(struct.pack('i', nfacets))
+        f.write(struct.pack('<i', nfacets))
 
     f.close()
 
@@ -212,31 +232,50 @@ def tri_write(filename, x, y, z, tri, mode='binary'):
 
 # Local subfunctions
 
-def local_write_facet(f, p1, p2, p3, mode):
-    if np.isnan(p1).any() or np.isnan(p2).any() or np.isnan(p3).any():
-            return 0;
-
-    n = local_find_normal(p1, p2, p3)
+def local_grid_facets(x, y, z):
+    # Two facets per grid quad, in the same row-major order as the old loops:
+    # (i,j)-(i,j+1)-(i+1,j+1) then (i+1,j+1)-(i+1,j)-(i,j)
+    v = np.stack((x, y, z), axis=-1)
+    a = v[:-1, :-1]
+    b = v[:-1, 1:]
+    c = v[1:, 1:]
+    d = v[1:, :-1]
+    p1 = np.stack((a, c), axis=2).reshape(-1, 3)
+    p2 = np.stack((b, d), axis=2).reshape(-1, 3)
+    p3 = np.stack((c, a), axis=2).reshape(-1, 3)
+    return p1, p2, p3
+
+def local_tri_facets(vertices, simplices):
+    # One gather for all corners, (ntri, 3, 3)
+    corners = vertices[simplices]
+    return corners[:, 0], corners[:, 1], corners[:, 2]
+
+def local_find_normals(p1, p2, p3, skip_degenerate=False):
+    a = p2 - p1
+    b = p3 - p1
+    v3 = np.cross(a, b)
+    length = np.sqrt(np.sum(v3*v3, axis=1, keepdims=True))
+    if skip_degenerate:
+        # Zero area up to rounding: the cross product is tiny next to the edges it came from
+        keep = length[:, 0] > 1e-12 * np.sqrt(np.sum(a*a, axis=1) * np.sum(b*b, axis=1))
+    else:
+        keep = np.ones(len(v3), dtype=bool)
+    return np.divide(v3, length, out=np.zeros_like(v3), where=length > 0), keep
+
+def local_write_facets(f, p1, p2, p3, mode, skip_degenerate=False):
+    valid = ~(np.isnan(p1).any(axis=1) | np.isnan(p2).any(axis=1) | np.isnan(p3).any(axis=1))
+    p1, p2, p3 = p1[valid], p2[valid], p3[valid]
+    n, keep = local_find_normals(p1, p2, p3, skip_degenerate)
+    if not keep.all():
+        n, p1, p2, p3 = n[keep], p1[keep], p2[keep], p3[keep]
     if mode == 'ascii':
-        f.write('facet normal %.7f %.7f %.7f\n' % (n[0], n[1], n[2]))
-        f.write('outer loop\n')
-        f.write('vertex %.7f %.7f %.7f\n' % (p1[0], p1[1], p1[2]))
-        f.write('vertex %.7f %.7f %.7f\n' % (p2[0], p2[1], p2[2]))
-        f.write('vertex %.7f %.7f %.7f\n' % (p3[0], p3[1], p3[2]))
-        f.write('endloop\n')
-        f.write('endfacet\n')
+        values = np.concatenate((n, p1, p2, p3), axis=1)
+        f.write((ASCII_FACET_FORMAT * values.shape[0]) % tuple(values.ravel()))
     else:
-        f.write(struct.pack('%sf' % len(n), *n))
-        f.write(struct.pack('%sf' % len(p1), *p1))
-        f.write(struct.pack('%sf' % len(p2), *p2))
-        f.write(struct.pack('%sf' % len(p3), *p3))
-        f.write(struct.pack('h', 0))
-    return 1
-
-def local_find_normal(p1, p2, p3):
-    v1 = p2 - p1
-    v2 = p3 - p1
-    v3 = np.cross(v1, v2)
-    n = v3 / math.sqrt(np.sum(v3*v3))
-    return n
-
+        facets = np.zeros(p1.shape[0], dtype=STL_FACET_DTYPE)
+        facets['normal'] = n
+        facets['v1'] = p1
+        facets['v2'] = p2
+        facets['v3'] = p3
+        facets.tofile(f)
+    return p1.shape[0]
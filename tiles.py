@@ -0,0 +1,96 @@
+### tiles.py --- Tiled, multi-process interpolation and contouring ---
+
+### The interpolation grid is split into tiles that share their boundary row
+### and column of nodes. Each tile is interpolated and contoured in its own
+### process, from only the triangles of the global triangulation that touch
+### it, so per-worker memory is bounded by the tile size. Contours are
+### stitched back together across the tile seams afterwards.
+###
+### The workers get the global triangles themselves and never triangulate
+### their points again: where four or more points lie on one circle (every
+### square of a gridded survey) the Delaunay triangulation is not unique,
+### and a tile could split a square along the other diagonal than the full
+### run and its neighbouring tiles.
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import triangulation
+import contouring
+
+def tile_ranges(n, tile_nodes):
+    """
+    Split n grid nodes into inclusive (start, stop) ranges of about tile_nodes
+    nodes, each range sharing its last node with the next one.
+    """
+    tile_nodes = max(2, tile_nodes)
+    starts = list(range(0, max(n - 1, 1), tile_nodes - 1))
+    return [(i, min(i + tile_nodes - 1, n - 1)) for i in starts]
+
+def process_tile(x, y, z, simplices, x_new, y_new, levels, want_contours, want_grid):
+    """
+    Interpolate one tile from the global triangles touching it (simplices,
+    numbered into x, y, z) and contour it. Runs in a worker process.
+    Returns (Z tile or None, contours or None).
+    """
+    if len(simplices) == 0:
+        Z = np.full((len(y_new), len(x_new)), np.nan)
+    else:
+        weights = triangulation.grid_weights(x, y, simplices, x_new, y_new)
+        Z = triangulation.interpolate(z, weights, (len(y_new), len(x_new)))
+    contours = None
+    if want_contours:
+        if np.isnan(Z).all():
+            contours = [(level, []) for level in levels]
+        else:
+            contours = contouring.grid_contours(x_new, y_new, Z, levels)
+    return (Z if want_grid else None), contours
+
+def tiled_interpolation(x, y, z, x_new, y_new, levels, tile_size, resolution,
+                        want_contours=True, want_grid=True, jobs=None):
+    """
+    Interpolate the points onto np.meshgrid(x_new, y_new) and contour the
+    result tile by tile over a pool of jobs processes (all cores by default).
+
+    tile_size is the tile edge length in meters. Returns (Z or None,
+    contours or None) with contours stitched across tile seams.
+    """
+    triangles = triangulation.build_triangles(x, y)
+    tri_x = x[triangles]
+    tri_y = y[triangles]
+    tri_min_x, tri_max_x = tri_x.min(axis=1), tri_x.max(axis=1)
+    tri_min_y, tri_max_y = tri_y.min(axis=1), tri_y.max(axis=1)
+
+    tile_nodes = int(round(tile_size / resolution)) + 1
+    x_ranges = tile_ranges(len(x_new), tile_nodes)
+    y_ranges = tile_ranges(len(y_new), tile_nodes)
+
+    Z = np.full((len(y_new), len(x_new)), np.nan) if want_grid else None
+    segments = [[] for _ in levels]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = []
+        for j0, j1 in y_ranges:
+            for i0, i1 in x_ranges:
+                # Triangles whose bounding box touches the tile
+                touching = (tri_max_x >= x_new[i0]) & (tri_min_x <= x_new[i1]) \
+                    & (tri_max_y >= y_new[j0]) & (tri_min_y <= y_new[j1])
+                # Only their points go to the worker, renumbered
+                used, simplices = np.unique(triangles[touching], return_inverse=True)
+                simplices = simplices.reshape(-1, 3)
+                futures.append(((i0, i1, j0, j1), executor.submit(
+                    process_tile, x[used], y[used], z[used], simplices,
+                    x_new[i0:i1+1], y_new[j0:j1+1], levels, want_contours, want_grid)))
+
+        for (i0, i1, j0, j1), future in futures:
+            tile_Z, tile_contours = future.result()
+            if want_grid:
+                Z[j0:j1+1, i0:i1+1] = tile_Z
+            if want_contours:
+                for k, (level, segs) in enumerate(tile_contours):
+                    segments[k].extend(segs)
+
+    contours = None
+    if want_contours:
+        tolerance = resolution * 1e-6
+        contours = [(level, contouring.stitch_segments(segs, tolerance)) for level, segs in zip(levels, segments)]
+    return Z, contours
@@ -0,0 +1,185 @@
+### triangulation.py --- Delaunay triangulation of the survey points ---
+
+### Linear interpolation onto the contour grid, split in two stages:
+### the triangulation plus the grid-to-simplex barycentric weights, which
+### only depend on the point positions and the grid, and the weighted sum
+### over the heights. The first stage can be cached on disk, so reruns with
+### a different zero reading or -p only pay for the second.
+
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+
+# Weights kept in memory between runs by long running processes (server.py),
+# least recently used first out. 0 keeps nothing.
+MEMORY_CACHE_SIZE = 0
+memory_cache = OrderedDict()
+
+def cache_key(x, y, x_new, y_new):
+    """
+    Hash of the point positions and the grid axes the weights were built for.
+    Heights are deliberately left out, they do not change the weights.
+    """
+    h = hashlib.sha1()
+    for a in (x, y, x_new, y_new):
+        a = np.ascontiguousarray(a, dtype=np.float64)
+        h.update(str(a.shape).encode('ascii'))
+        h.update(a.tobytes())
+    return h.hexdigest()
+
+def build_delaunay(x, y):
+    """
+    scipy Delaunay triangulation of the points (x, y), for point_weights(tri=).
+    """
+    from scipy.spatial import Delaunay
+
+    return Delaunay(np.column_stack((x, y)))
+
+def build_triangles(x, y):
+    """
+    Delaunay triangulation of the points (x, y) as a (ntri, 3) array of vertex indices.
+    """
+    return build_delaunay(x, y).simplices
+
+def build_weights(x, y, x_new, y_new):
+    """
+    Triangulate the points (x, y) and locate every node of the grid
+    np.meshgrid(x_new, y_new) in it.
+
+    Returns a dict with
+        simplices : (ntri, 3) vertex indices of the triangulation
+        inside    : flat indices of the grid nodes inside the convex hull
+        vertices  : (ninside, 3) vertex indices of the triangle holding each node
+        weights   : (ninside, 3) barycentric weights of those vertices
+    """
+    X, Y = np.meshgrid(x_new, y_new)
+    xi = np.column_stack((X.ravel(), Y.ravel()))
+    del X, Y
+    return local_weights(x, y, xi)
+
+def grid_weights(x, y, simplices, x_new, y_new):
+    """
+    Same as build_weights, but from given triangles (the (ntri, 3) simplices
+    of a triangulation of (x, y)) instead of triangulating the points again.
+    Every triangle is matched against the grid nodes inside its bounding
+    box, so the cost follows the area covered and not the grid size.
+    """
+    simplices = np.asarray(simplices)
+    tx = x[simplices]
+    ty = y[simplices]
+    # Grid node ranges [i0, i1) x [j0, j1) of each triangle's bounding box
+    i0 = np.searchsorted(x_new, tx.min(axis=1), side='left')
+    i1 = np.searchsorted(x_new, tx.max(axis=1), side='right')
+    j0 = np.searchsorted(y_new, ty.min(axis=1), side='left')
+    j1 = np.searchsorted(y_new, ty.max(axis=1), side='right')
+    width = np.maximum(i1 - i0, 0)
+    counts = width * np.maximum(j1 - j0, 0)
+
+    # One (triangle, node) candidate per node of every bounding box
+    t = np.repeat(np.arange(len(simplices)), counts)
+    k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    ix = i0[t] + k % width[t]
+    iy = j0[t] + k // width[t]
+    del k
+
+    # Barycentric weights of the node in the candidate triangle
+    ax, bx, cx = tx[t, 0], tx[t, 1], tx[t, 2]
+    ay, by, cy = ty[t, 0], ty[t, 1], ty[t, 2]
+    det = (by - cy) * (ax - cx) + (cx - bx) * (ay - cy)
+    px = x_new[ix] - cx
+    py = y_new[iy] - cy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wa = ((by - cy) * px + (cx - bx) * py) / det
+        wb = ((cy - ay) * px + (ax - cx) * py) / det
+    wc = 1 - wa - wb
+    # Nodes on a shared edge are inside both triangles, keep the first
+    eps = -1e-10
+    hit = (det != 0) & (wa >= eps) & (wb >= eps) & (wc >= eps)
+    node = iy[hit] * len(x_new) + ix[hit]
+    inside, first = np.unique(node, return_index=True)
+    hit = np.nonzero(hit)[0][first]
+
+    index_type = np.int32 if len(x) < 2**31 else np.int64
+    return {
+        'simplices': simplices.astype(index_type),
+        'inside': inside,
+        'vertices': simplices[t[hit]].astype(index_type),
+        'weights': np.column_stack((wa[hit], wb[hit], wc[hit])),
+    }
+
+def point_weights(x, y, px, py, tri=None):
+    """
+    Same as build_weights for arbitrary points (px, py) instead of a grid,
+    interpolate(z, weights, px.shape) gives the heights at the points.
+    tri is the scipy Delaunay of (x, y) when the caller already has it.
+    """
+    return local_weights(x, y, np.column_stack((np.ravel(px), np.ravel(py))), tri)
+
+def load_or_build_weights(x, y, x_new, y_new, cache_dir=None):
+    """
+    Same as build_weights, but reuse the result kept in memory or stored in
+    cache_dir when the points and grid match a previous run.
+    Returns (weights_dict, cache_hit).
+    """
+    if cache_dir is None and MEMORY_CACHE_SIZE == 0:
+        return build_weights(x, y, x_new, y_new), False
+
+    key = cache_key(x, y, x_new, y_new)
+    if key in memory_cache:
+        memory_cache.move_to_end(key)
+        return memory_cache[key], True
+    weights, cache_hit = local_load_or_build(key, x, y, x_new, y_new, cache_dir)
+    if MEMORY_CACHE_SIZE > 0:
+        memory_cache[key] = weights
+        while len(memory_cache) > MEMORY_CACHE_SIZE:
+            memory_cache.popitem(last=False)
+    return weights, cache_hit
+
+def interpolate(z, weights, shape):
+    """
+    Linear interpolation of the heights z onto a grid of the given shape,
+    NaN outside the convex hull of the points. Matches
+    griddata((x, y), z, (X, Y), method='linear').
+    """
+    Z = np.full(shape, np.nan)
+    Z.flat[weights['inside']] = np.einsum('ij,ij->i', z[weights['vertices']], weights['weights'])
+    return Z
+
+# Local subfunctions
+
+def local_weights(x, y, xi, tri=None):
+    if tri is None:
+        from scipy.spatial import Delaunay
+        tri = Delaunay(np.column_stack((x, y)))
+    simplex = tri.find_simplex(xi)
+    inside = np.nonzero(simplex >= 0)[0]
+    simplex = simplex[inside]
+    transform = tri.transform[simplex]
+    b = np.einsum('ijk,ik->ij', transform[:, :2], xi[inside] - transform[:, 2])
+    index_type = np.int32 if len(x) < 2**31 else np.int64
+    return {
+        'simplices': tri.simplices.astype(index_type),
+        'inside': inside,
+        'vertices': tri.simplices[simplex].astype(index_type),
+        'weights': np.column_stack((b, 1 - b.sum(axis=1))),
+    }
+
+def local_load_or_build(key, x, y, x_new, y_new, cache_dir):
+    if cache_dir is None:
+        return build_weights(x, y, x_new, y_new), False
+
+    path = os.path.join(cache_dir, 'tri_%s.npz' % key)
+    if os.path.isfile(path):
+        with np.load(path) as cached:
+            return {name: cached[name] for name in cached.files}, True
+
+    weights = build_weights(x, y, x_new, y_new)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write next to the final name and rename, so a crashed or concurrent
+    # run never leaves a half written cache entry behind
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **weights)
+    os.replace(tmp_path, path)
+    return weights, False
@@ -0,0 +1,71 @@
+### volumes.py --- Cut and fill between two surveys of the same site ---
+
+### Both surveys are interpolated on one shared grid, band of rows by band
+### of rows, so only one band of weights and heights is in memory at a
+### time whatever the size of the grid. Each grid cell holds the mean of
+### the height difference at its four corners, cells with a corner outside
+### either survey are left out. The difference is contoured per band at
+### multiples of the contour step, and the pieces are stitched across the
+### band seams like the tiles of tiles.py.
+
+import numpy as np
+import triangulation
+import contouring
+
+DEFAULT_CHUNK_CELLS = 1 << 20
+
+def compare_surfaces(before, after, x_new, y_new, contour_step=None, chunk_cells=DEFAULT_CHUNK_CELLS):
+    """
+    Cut and fill from the before to the after survey, both (n, 3) x, y, z
+    points, over the grid np.meshgrid(x_new, y_new).
+
+    Returns a dict with
+        cut, fill, net : volumes (net = fill - cut)
+        area           : plan area covered by both surveys
+        contours       : difference contours (level, [vertex arrays]) every
+                         contour_step, None without a contour_step
+    """
+    from scipy.spatial import Delaunay
+
+    tri_before = Delaunay(before[:, :2])
+    tri_after = Delaunay(after[:, :2])
+    cell_area = ((x_new[-1] - x_new[0]) / (len(x_new) - 1)) * ((y_new[-1] - y_new[0]) / (len(y_new) - 1))
+    band_rows = max(2, chunk_cells // len(x_new))
+
+    cut = fill = area = 0.0
+    segments = {}
+    # Bands share their boundary row, so every cell is counted once
+    for j0 in range(0, len(y_new) - 1, band_rows - 1):
+        j1 = min(j0 + band_rows - 1, len(y_new) - 1)
+        X, Y = np.meshgrid(x_new, y_new[j0:j1+1])
+        D = local_surface(after, tri_after, X, Y) - local_surface(before, tri_before, X, Y)
+        del X, Y
+
+        cells = (D[:-1, :-1] + D[:-1, 1:] + D[1:, :-1] + D[1:, 1:]) * (cell_area / 4)
+        fill += cells[cells > 0].sum()
+        cut -= cells[cells < 0].sum()
+        area += np.count_nonzero(~np.isnan(cells)) * cell_area
+
+        if contour_step and not np.isnan(D).all():
+            # Multiples of the step, so the levels of all bands line up
+            levels = contour_step * np.arange(np.ceil(np.nanmin(D) / contour_step), np.floor(np.nanmax(D) / contour_step) + 1)
+            for level, segs in contouring.grid_contours(x_new, y_new[j0:j1+1], D, levels):
+                segments.setdefault(round(level / contour_step), []).extend(segs)
+
+    contours = None
+    if contour_step:
+        tolerance = min(abs(x_new[1] - x_new[0]), abs(y_new[1] - y_new[0])) * 1e-6
+        contours = [(k * contour_step, contouring.stitch_segments(segments[k], tolerance)) for k in sorted(segments)]
+    return {
+        'cut': float(cut),
+        'fill': float(fill),
+        'net': float(fill - cut),
+        'area': float(area),
+        'contours': contours,
+    }
+
+# Local subfunctions
+
+def local_surface(points, tri, X, Y):
+    weights = triangulation.point_weights(points[:, 0], points[:, 1], X, Y, tri=tri)
+    return triangulation.interpolate(points[:, 2], weights, X.shape)